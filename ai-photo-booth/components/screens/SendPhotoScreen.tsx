@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { motion } from 'framer-motion'
 import { ArrowLeft, Mail, Phone, SendIcon, ExternalLink, CheckCircle, Loader2 } from 'lucide-react'
 import { Button } from '@/components/ui/button'
@@ -23,6 +23,8 @@ export default function SendPhotoScreen({ photos, deliveryMethod, onSent, onBack
   const [error, setError] = useState<string | null>(null)
   const [validationError, setValidationError] = useState<string | null>(null)
   const [notificationPhone, setNotificationPhone] = useState('')
+  // One idempotency key per distinct send, reused when the same send is retried
+  const sendKeyRef = useRef<{ signature: string; key: string } | null>(null)
 
   // Telegram deep linking state
   const [telegramSessionId, setTelegramSessionId] = useState<string | null>(null)
@@ -30,33 +32,50 @@ export default function SendPhotoScreen({ photos, deliveryMethod, onSent, onBack
   const [isWaitingForTelegram, setIsWaitingForTelegram] = useState(false)
   const [telegramLinked, setTelegramLinked] = useState(false)
 
-  // Poll for Telegram session status
+  // Long-poll for Telegram session status
   useEffect(() => {
     if (!isWaitingForTelegram || !telegramSessionId) return
 
-    const interval = setInterval(async () => {
-      try {
-        const status = await checkTelegramSession(telegramSessionId)
+    let cancelled = false
 
-        if (status.expired) {
-          setError('Session expired. Please try again.')
-          setIsWaitingForTelegram(false)
-          setTelegramSessionId(null)
-          return
-        }
+    const waitForSession = async () => {
+      while (!cancelled) {
+        try {
+          const status = await checkTelegramSession(telegramSessionId, 20)
+          if (cancelled) return
+
+          if (status.expired) {
+            setError('Session expired. Please try again.')
+            setIsWaitingForTelegram(false)
+            setTelegramSessionId(null)
+            return
+          }
 
-        if (status.isLinked && status.isSent) {
-          setTelegramLinked(true)
-          setIsWaitingForTelegram(false)
-          setTaskId(status.taskId || null)
-          setTimeout(() => onSent(), 1500)
+          if (status.isLinked && status.isSent) {
+            setTelegramLinked(true)
+            setIsWaitingForTelegram(false)
+            setTaskId(status.taskId || null)
+            setTimeout(() => onSent(), 1500)
+            return
+          }
+
+          if (status.retryAfter) {
+            // Every long-poll slot was taken: poll again after the hinted delay
+            await new Promise((resolve) => setTimeout(resolve, status.retryAfter! * 1000))
+          }
+        } catch (err) {
+          console.error('Failed to check session status:', err)
+          // Back off before retrying after a network error
+          await new Promise((resolve) => setTimeout(resolve, 2000))
         }
-      } catch (err) {
-        console.error('Failed to check session status:', err)
       }
-    }, 2000) // Poll every 2 seconds
+    }
 
-    return () => clearInterval(interval)
+    waitForSession()
+
+    return () => {
+      cancelled = true
+    }
   }, [isWaitingForTelegram, telegramSessionId, onSent])
 
   const validateInput = () => {
@@ -92,12 +111,18 @@ export default function SendPhotoScreen({ photos, deliveryMethod, onSent, onBack
     setTaskId(null)
     setValidationError(null)
 
+    const signature = `${deliveryMethod}|${recipient}|${notificationPhone.trim()}`
+    if (sendKeyRef.current?.signature !== signature) {
+      sendKeyRef.current = { signature, key: crypto.randomUUID() }
+    }
+
     try {
       const result = await enqueueNotification({
         recipient,
         photos,
         preferredMethod: deliveryMethod,
         notificationPhone: notificationPhone.trim() || undefined,
+        idempotencyKey: sendKeyRef.current.key,
       })
 
       // Handle Telegram deep linking flow
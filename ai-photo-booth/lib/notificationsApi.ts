@@ -3,11 +3,17 @@ import type { DeliveryMethod } from '@/components/screens/DeliveryMethodScreen'
 const API_BASE_URL =
   process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000'
 
+// Upload photo bytes straight to MinIO via presigned PUT URLs instead of
+// sending base64 through the backend. Requires CORS on the MinIO bucket.
+const DIRECT_UPLOAD = process.env.NEXT_PUBLIC_DIRECT_UPLOAD === 'true'
+
 type SendRequest = {
   recipient: string
   photos: string[]
   preferredMethod: DeliveryMethod
   notificationPhone?: string
+  // Reused on retries so the backend replays the first response
+  idempotencyKey?: string
 }
 
 type SendResponse = {
@@ -19,20 +25,66 @@ type SendResponse = {
   username?: string
 }
 
+type UploadSlot = {
+  key: string
+  url: string
+}
+
+export async function uploadPhotosDirect(photos: string[]): Promise<string[]> {
+  const response = await fetch(`${API_BASE_URL}/api/notifications/uploads/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ count: photos.length }),
+  })
+
+  const data = await response.json().catch(() => ({}))
+
+  if (!response.ok) {
+    throw new Error(data?.error || `Request failed with status ${response.status}`)
+  }
+
+  const uploads: UploadSlot[] = data?.uploads || []
+
+  await Promise.all(
+    uploads.map(async ({ url }, idx) => {
+      const blob = await (await fetch(photos[idx])).blob()
+      const put = await fetch(url, {
+        method: 'PUT',
+        headers: {
+          'Content-Type': 'image/jpeg',
+        },
+        body: blob,
+      })
+      if (!put.ok) {
+        throw new Error(`Photo ${idx + 1} upload failed with status ${put.status}`)
+      }
+    })
+  )
+
+  return uploads.map(({ key }) => key)
+}
+
 export async function enqueueNotification({
   recipient,
   photos,
   preferredMethod,
   notificationPhone,
+  idempotencyKey,
 }: SendRequest): Promise<SendResponse> {
+  const photoKeys = DIRECT_UPLOAD ? await uploadPhotosDirect(photos) : undefined
+
   const response = await fetch(`${API_BASE_URL}/api/notifications/send/`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}),
     },
     body: JSON.stringify({
       recipient,
-      photos,
+      photos: photoKeys ? [] : photos,
+      photo_keys: photoKeys,
       preferred_method: preferredMethod,
       notification_phone: notificationPhone,
     }),
@@ -55,14 +107,21 @@ export async function enqueueNotification({
   }
 }
 
-export async function checkTelegramSession(sessionId: string): Promise<{
+export async function checkTelegramSession(
+  sessionId: string,
+  waitSeconds = 0
+): Promise<{
   isLinked: boolean
   isSent: boolean
   taskId?: string
   expired: boolean
+  retryAfter?: number
 }> {
+  // waitSeconds > 0 long-polls: the server answers once photos are sent,
+  // the session expires or the wait runs out. A busy server answers at once
+  // with retry_after instead of holding the request
   const response = await fetch(
-    `${API_BASE_URL}/api/notifications/telegram/session/?session_id=${sessionId}`
+    `${API_BASE_URL}/api/notifications/telegram/session/?session_id=${sessionId}&wait=${waitSeconds}`
   )
 
   const data = await response.json().catch(() => ({}))
@@ -76,5 +135,6 @@ export async function checkTelegramSession(sessionId: string): Promise<{
     isSent: data?.is_sent || false,
     taskId: data?.task_id,
     expired: data?.expired || false,
+    retryAfter: data?.retry_after ?? undefined,
   }
 }
@@ -0,0 +1 @@
+# Offline benchmarks and local provider stand-ins
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the end-to-end benchmarks (pipeline, load_test): synthetic
+photos, percentiles, the environment that points a child process at the
+local stand-ins, and where runs are stored.
+"""
+import argparse
+import io
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def synthetic_jpeg(megabytes: float, seed: int) -> bytes:
+    from PIL import Image, ImageChops
+
+    # 12 MP camera frame; noise level picked so quality 90 lands near the target size
+    width, height = 4000, 3000
+    base = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 6 * megabytes + seed % 3)
+    image = Image.merge(
+        "RGB", (base, ImageChops.add(noise, base, scale=2.0), base.rotate(90).resize((width, height)))
+    )
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def unique_photo(photo: bytes) -> bytes:
+    # Bytes after the JPEG EOI marker are ignored by decoders but change the
+    # content hash, so every task uploads and renders fresh photos
+    return photo + os.urandom(16)
+
+
+def child_env(args: argparse.Namespace, s3, smtp, stub) -> Dict[str, str]:
+    """Environment for a child process using the fake S3, SMTP sink and provider stub."""
+    env = dict(os.environ)
+    for name in ("POSTGRES_DB", "CACHE_REDIS_URL"):
+        env.pop(name, None)
+    env.update(
+        {
+            "DJANGO_SETTINGS_MODULE": "photo_booth_backend.settings",
+            "MINIO_ENDPOINT": s3.endpoint,
+            "MINIO_PUBLIC_ENDPOINT": s3.endpoint,
+            "MINIO_USE_SSL": "false",
+            "EMAIL_HOST": smtp.host,
+            "EMAIL_PORT": str(smtp.port),
+            "EMAIL_USE_SSL": "false",
+            "EMAIL_HOST_USER": "",
+            "EMAIL_HOST_PASSWORD": "",
+            "TELEGRAM_BOT_TOKEN": "bench",
+            "TELEGRAM_API_BASE": stub.base_url,
+            "TWILIO_ACCOUNT_SID": "ACbench",
+            "TWILIO_AUTH_TOKEN": "bench",
+            "TWILIO_FROM_NUMBER": "+15550000000",
+            "TWILIO_API_BASE": stub.base_url,
+            "SIMULATE_DELIVERY_FAILURES": "false",
+            "DELIVERY_DEADLINE_SECONDS": "3600",
+        }
+    )
+    if not args.provider_limits:
+        for name in ("TELEGRAM_RATE_PER_SECOND", "TELEGRAM_CHAT_RATE_PER_SECOND", "TWILIO_RATE_PER_SECOND"):
+            env[name] = "100000"
+        for name in ("TELEGRAM_RATE_BURST", "TELEGRAM_CHAT_RATE_BURST", "TWILIO_RATE_BURST"):
+            env[name] = "1000"
+    return env
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
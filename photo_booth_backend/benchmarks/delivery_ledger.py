@@ -0,0 +1,145 @@
+"""
+Delivery ledger write throughput and status lookup latency.
+
+Writes go to a throwaway SQLite database: first --compare deliveries with
+one INSERT/UPDATE per record (what a naive ledger would do from the task),
+then the same records through the write-behind buffer and its batched
+flush. The ledger then grows to each of --sizes deliveries (~1.3 attempts
+each, 5% of recipients returning customers) and the /deliveries/ lookups by
+task_id and by recipient are timed at every size:
+
+    python -m benchmarks.delivery_ledger --sizes 100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "photo_booth_backend.settings")
+os.environ.pop("POSTGRES_DB", None)
+
+
+def _setup(db_path: str) -> None:
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+
+def _recipient(i: int) -> str:
+    # Every 20th delivery goes to one of a few hundred repeat recipients
+    return f"regular{i % 300}@example.com" if i % 20 == 0 else f"guest{i}@example.com"
+
+
+def _record(i: int, task_id: str, ledger) -> int:
+    recipient = _recipient(i)
+    started_at = time.time()
+    ledger.record_queued(task_id, recipient, "email", 4, started_at)
+    records = 2
+    if random.random() < 0.3:
+        ledger.record_attempt(task_id, "email", False, "SMTP timeout")
+        ledger.record_attempt(task_id, "telegram", True)
+        records += 2
+    else:
+        ledger.record_attempt(task_id, "email", True)
+        records += 1
+    ledger.record_outcome(task_id, recipient, "email", 4, True, "email", started_at)
+    return records
+
+
+def _per_row(count: int) -> float:
+    from django.utils import timezone
+
+    from notifications.models import Delivery, DeliveryAttempt
+
+    started = time.perf_counter()
+    records = 0
+    for i in range(count):
+        task_id = uuid.uuid4().hex
+        Delivery.objects.create(
+            task_id=task_id, recipient=_recipient(i), preferred_method="email",
+            photo_count=4, created_at=timezone.now(),
+        )
+        DeliveryAttempt.objects.create(task_id=task_id, channel="email", success=True, created_at=timezone.now())
+        Delivery.objects.filter(task_id=task_id).update(
+            status="delivered", channel="email", completed_at=timezone.now()
+        )
+        records += 3
+    return records / (time.perf_counter() - started)
+
+
+def _buffered(start: int, stop: int, ledger) -> tuple[float, list[str]]:
+    started = time.perf_counter()
+    records = 0
+    sampled = []
+    for i in range(start, stop):
+        task_id = uuid.uuid4().hex
+        records += _record(i, task_id, ledger)
+        if i % 97 == 0:
+            sampled.append(task_id)
+        if i % 2000 == 1999:
+            ledger.flush()
+    ledger.flush()
+    return records / (time.perf_counter() - started), sampled
+
+
+def _time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--compare", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(os.path.join(tmp, "ledger.sqlite3"))
+        from django.core.management import call_command
+
+        from notifications import ledger
+        from notifications.models import Delivery, DeliveryAttempt
+
+        call_command("migrate", verbosity=0)
+        # The benchmark flushes by hand; keep the background thread out of the way
+        os.environ["DELIVERY_LEDGER_FLUSH_SECONDS"] = "3600"
+        os.environ["DELIVERY_LEDGER_BATCH_SIZE"] = "100000"
+
+        per_row = _per_row(args.compare)
+        buffered, _ = _buffered(0, args.compare, ledger)
+        print(
+            f"writes: per-row {per_row:,.0f} records/s, "
+            f"write-behind {buffered:,.0f} records/s ({buffered / per_row:.1f}x)"
+        )
+        Delivery.objects.all().delete()
+        DeliveryAttempt.objects.all().delete()
+
+        sampled: list[str] = []
+        total = 0
+        for size in sizes:
+            rate, new = _buffered(total, size, ledger)
+            sampled += new
+            total = size
+            regulars = [f"regular{i}@example.com" for i in range(300)]
+            by_task = _time_ms(lambda: ledger.get_delivery(random.choice(sampled)), args.lookups)
+            by_recipient = _time_ms(lambda: ledger.deliveries_for(random.choice(regulars), 20), args.lookups)
+            print(
+                f"deliveries={size:>9} load={rate:9,.0f} records/s "
+                f"by-task={by_task:7.3f} ms by-recipient(20)={by_recipient:7.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
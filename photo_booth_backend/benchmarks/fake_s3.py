@@ -0,0 +1,118 @@
+"""
+Minimal in-memory S3 stand-in for offline benchmarks.
+
+Implements just enough of the S3 REST API for the MinIO client used in
+``notifications.storage``: bucket HEAD/PUT, GetBucketLocation and object
+PUT/GET/HEAD. Signatures are not verified. Every request sleeps for
+``latency`` seconds to model the network round trip to MinIO.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+LOCATION_XML = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></LocationConstraint>'
+)
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.buckets: Dict[str, Dict[str, Tuple[bytes, str]]] = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self) -> "FakeS3Server":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: FakeS3Server
+
+    def log_message(self, format, *args):  # noqa: A002 - silence request logging
+        pass
+
+    def _split(self):
+        parts = urlsplit(self.path)
+        bucket, _, key = parts.path.lstrip("/").partition("/")
+        return bucket, key, parts.query
+
+    def _reply(self, status: int, body: bytes = b"", headers: Dict[str, str] | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _begin(self):
+        with self.server._lock:
+            self.server.request_count += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_HEAD(self):
+        self._begin()
+        bucket, key, _ = self._split()
+        objects = self.server.buckets.get(bucket)
+        if objects is None or (key and key not in objects):
+            self._reply(404)
+            return
+        if key:
+            content, content_type = objects[key]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.send_header("Content-Type", content_type)
+            self.send_header("ETag", f'"{hashlib.md5(content).hexdigest()}"')
+            self.end_headers()
+            return
+        self._reply(200)
+
+    def do_GET(self):
+        self._begin()
+        bucket, key, query = self._split()
+        if not key and query.startswith("location"):
+            self._reply(200, LOCATION_XML, {"Content-Type": "application/xml"})
+            return
+        objects = self.server.buckets.get(bucket) or {}
+        if key not in objects:
+            self._reply(404)
+            return
+        content, content_type = objects[key]
+        self._reply(200, content, {"Content-Type": content_type})
+
+    def do_PUT(self):
+        self._begin()
+        bucket, key, _ = self._split()
+        body = self._read_body()
+        if not key:
+            self.server.buckets.setdefault(bucket, {})
+            self._reply(200)
+            return
+        content_type = self.headers.get("Content-Type", "application/octet-stream")
+        self.server.buckets.setdefault(bucket, {})[key] = (body, content_type)
+        self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
@@ -0,0 +1,53 @@
+"""
+Compare one-connection-per-call ``requests.post`` with the pooled
+provider sessions from ``notifications.http_clients``.
+
+The stub server charges ``--connect-ms`` once per new connection (standing
+in for the TCP+TLS handshake to api.telegram.org) and ``--latency-ms`` per
+request:
+
+    python -m benchmarks.http_pooling --calls 50 --connect-ms 40 --latency-ms 5
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.stub_http import StubProviderServer
+from notifications.http_clients import get_session, provider_timeout
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--connect-ms", type=float, default=40.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = StubProviderServer(
+        latency=args.latency_ms / 1000, connect_latency=args.connect_ms / 1000
+    ).start()
+    url = f"{server.base_url}/botTOKEN/sendMessage"
+    payload = {"chat_id": "1", "text": "hi"}
+
+    try:
+        for label, post in (
+            ("unpooled", lambda: requests.post(url, json=payload, timeout=provider_timeout("telegram"))),
+            ("pooled", lambda: get_session("telegram").post(url, json=payload, timeout=provider_timeout("telegram"))),
+        ):
+            connections_before = server.connections
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                post().raise_for_status()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{label:<9} calls={args.calls} total={elapsed * 1000:8.1f} ms "
+                f"per-call={elapsed / args.calls * 1000:6.1f} ms "
+                f"connections={server.connections - connections_before}"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure the per-channel image stage: bytes saved and throughput per core.
+
+Synthetic kiosk-sized JPEGs are rendered into every variant from
+``notifications.images.VARIANTS``, first inline and then through a thread
+pool like the one delivery uses, with the variant cache bypassed:
+
+    python -m benchmarks.image_variants --photos 8 --width 3840 --height 2160
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops, ImageDraw
+
+from notifications.images import VARIANTS, render_variant
+
+
+def _synthetic_photo(width: int, height: int, seed: int) -> bytes:
+    # Gradients plus mild noise compress roughly like a real camera frame
+    red = Image.linear_gradient("L").resize((width, height))
+    green = red.rotate(90 + seed * 7).resize((width, height))
+    blue = Image.effect_noise((width, height), 24 + seed)
+    image = Image.merge("RGB", (red, green, ImageChops.add(blue, red, scale=2.0)))
+    draw = ImageDraw.Draw(image)
+    for i in range(20):
+        x, y = (seed * 97 + i * 181) % width, (seed * 53 + i * 127) % height
+        draw.ellipse((x, y, x + width // 8, y + height // 8), fill=(i * 12 % 255, 80, 160))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=8)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--threads", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    photos = [_synthetic_photo(args.width, args.height, seed) for seed in range(args.photos)]
+    source_bytes = sum(len(photo) for photo in photos)
+    print(f"source: {args.photos} photos, {source_bytes / 1e6:.1f} MB total")
+
+    for variant in VARIANTS:
+        started = time.perf_counter()
+        rendered = [render_variant(photo, variant) for photo in photos]
+        inline = time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            started = time.perf_counter()
+            list(pool.map(render_variant, photos, [variant] * len(photos)))
+            pooled = time.perf_counter() - started
+
+        out_bytes = sum(len(item) for item in rendered)
+        print(
+            f"{variant:<14} out={out_bytes / 1e6:6.2f} MB saved={100 * (1 - out_bytes / source_bytes):5.1f}% "
+            f"inline={args.photos / inline:6.1f} photos/s/core "
+            f"threads({args.threads})={args.photos / pooled:6.1f} photos/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+HTTP load test of the public endpoints against a local gunicorn server.
+
+The parent starts the offline stand-ins (fake S3, SMTP sink, Telegram/Twilio
+stub), migrates a throwaway SQLite database and runs gunicorn on it, then
+drives a seeded, weighted mix of synthetic traffic from --concurrency client
+threads for --duration seconds:
+
+  send       POST /send/ with --photos base64 JPEGs of ~--photo-mb each, to an
+             email address, a Telegram @username (opens a session) or a phone
+  subscribe  POST /subscribe/ with a fresh address
+  session    GET /telegram/session/ for a session opened by /send/
+  webhook    POST /telegram/webhook/ /start <session_id>, as --burst-size
+             simultaneous updates every --burst-every seconds
+
+With --celery=eager the tasks run inside the request, so /send/ and the
+webhook include the whole delivery; with --celery=stub (default) they are only
+enqueued on an in-memory broker, which measures the web tier alone.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --duration 60 --concurrency 16 --workers 4
+    python -m benchmarks.load_test --celery eager --mix send=1,session=3
+
+The report has per-endpoint latency percentiles, error rates and status codes
+plus the RSS of the gunicorn master and its workers (sampled from /proc, so
+Linux only). Runs are saved to --results-dir and compared with the previous
+one. SQLite serialises writers, so "database is locked" 500s under heavy
+/send/ + /subscribe/ load are the database, not the views.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+import requests
+
+from benchmarks.common import (
+    RESULTS_DIR,
+    child_env,
+    git_revision,
+    percentile,
+    synthetic_jpeg,
+    unique_photo,
+)
+
+WEBHOOK_SECRET = "load-test"
+DEFAULT_MIX = "send=2,subscribe=2,session=6"
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, status: str) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        rows = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            rows[endpoint] = {
+                "requests": len(samples),
+                "rps": len(samples) / elapsed,
+                "error_rate": errors / len(samples),
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "max_ms": max(samples) * 1000,
+                "statuses": dict(statuses),
+            }
+        return rows
+
+
+# --- server memory ----------------------------------------------------------
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(root: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name may contain spaces; ppid follows its closing paren
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        found.append(pid)
+        stack.extend(children.get(pid, []))
+    return found
+
+
+class _MemorySampler(threading.Thread):
+    """Samples the summed RSS of a process tree every ``interval`` seconds."""
+
+    def __init__(self, root: int, interval: float = 0.5) -> None:
+        super().__init__(daemon=True)
+        self.root = root
+        self.interval = interval
+        self.samples: List[int] = []
+        self.peak_processes = 0
+        self.stopped = threading.Event()
+
+    def sample(self) -> None:
+        pids = _descendants(self.root)
+        self.peak_processes = max(self.peak_processes, len(pids))
+        self.samples.append(sum(_rss_kb(pid) for pid in pids))
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        return {
+            "rss_start_mb": self.samples[0] / 1024,
+            "rss_peak_mb": max(self.samples) / 1024,
+            "rss_end_mb": self.samples[-1] / 1024,
+            "processes": self.peak_processes,
+        }
+
+
+# --- server -----------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args: argparse.Namespace, env: Dict[str, str], db_path: str, port: int) -> subprocess.Popen:
+    env = dict(env)
+    env.update(
+        {
+            "LOAD_TEST_DB": db_path,
+            "LOAD_TEST_CELERY": args.celery,
+            "TELEGRAM_WEBHOOK_SECRET": WEBHOOK_SECRET,
+            # Every client gets its own photos, but stay clear of the 409 wait anyway
+            "IDEMPOTENCY_WAIT_SECONDS": "0",
+        }
+    )
+    if args.celery == "stub":
+        env["CELERY_BROKER_URL"] = "memory://"
+    command = [
+        sys.executable, "-m", "gunicorn", "benchmarks.load_test_wsgi:application",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(args.workers),
+        "--threads", str(args.threads),
+        "--worker-class", "gthread" if args.threads > 1 else "sync",
+        "--preload",
+        "--timeout", "120",
+        "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, env=env, cwd=Path(__file__).resolve().parent.parent)
+
+
+def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {server.returncode}")
+        try:
+            requests.get(f"{base_url}/api/notifications/channels/", timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise SystemExit("gunicorn did not start in time")
+
+
+# --- traffic ----------------------------------------------------------------
+
+
+class _Traffic:
+    def __init__(self, args: argparse.Namespace, base_url: str, recorder: _Recorder) -> None:
+        self.args = args
+        self.api = f"{base_url}/api/notifications"
+        self.recorder = recorder
+        self.photos = [synthetic_jpeg(args.photo_mb, seed) for seed in range(args.photos)]
+        # Sessions opened by /send/, newest last; polled and /start-ed by the bursts
+        self.sessions: Deque[str] = deque(maxlen=10000)
+        self.started: Deque[str] = deque(maxlen=10000)
+        self.stop = threading.Event()
+        mix = dict(item.split("=") for item in args.mix.split(","))
+        self.endpoints = list(mix)
+        self.weights = [float(weight) for weight in mix.values()]
+
+    def _call(self, http: requests.Session, endpoint: str, method: str, path: str, **kwargs) -> Optional[dict]:
+        started = time.perf_counter()
+        try:
+            response = http.request(method, f"{self.api}{path}", timeout=self.args.timeout, **kwargs)
+        except requests.RequestException as exc:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(exc).__name__)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - started, str(response.status_code))
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def send(self, http: requests.Session, rng: random.Random) -> None:
+        roll = rng.random()
+        if roll < 0.6:
+            method, recipient = "email", f"guest{rng.getrandbits(32)}@example.com"
+        elif roll < 0.9:
+            method, recipient = "telegram", f"@guest{rng.getrandbits(32)}"
+        else:
+            method, recipient = "sms", f"+1555{rng.randrange(10**7):07d}"
+        photos = [
+            "data:image/jpeg;base64," + base64.b64encode(unique_photo(photo)).decode()
+            for photo in self.photos
+        ]
+        body = self._call(
+            http, f"send:{method}", "POST", "/send/",
+            json={"recipient": recipient, "photos": photos, "preferred_method": method},
+            headers={"Idempotency-Key": str(uuid.uuid4())},
+        )
+        if body and body.get("session_id"):
+            self.sessions.append(body["session_id"])
+
+    def subscribe(self, http: requests.Session, rng: random.Random) -> None:
+        payload = {"email": f"fan{rng.getrandbits(40)}@example.com"}
+        if rng.random() < 0.2:
+            payload["telegram_chat_id"] = str(rng.randrange(10**6, 10**9))
+        self._call(http, "subscribe", "POST", "/subscribe/", json=payload)
+
+    def session(self, http: requests.Session, rng: random.Random) -> None:
+        pool = self.started if self.started and rng.random() < 0.5 else self.sessions
+        if not pool:
+            return
+        session_id = pool[rng.randrange(len(pool))]
+        self._call(
+            http, "session", "GET", "/telegram/session/",
+            params={"session_id": session_id, "wait": self.args.session_wait},
+        )
+
+    def webhook(self, http: requests.Session, rng: random.Random) -> None:
+        # Mostly kiosk guests tapping Start; the rest bare /start with nothing to link
+        session_id = self.sessions.popleft() if self.sessions and rng.random() < 0.8 else ""
+        chat_id = rng.randrange(10**6, 10**9)
+        update = {
+            "update_id": rng.getrandbits(31),
+            "message": {
+                "message_id": rng.getrandbits(20),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "username": f"guest{chat_id}", "first_name": "Guest"},
+                "text": f"/start {session_id}".strip(),
+            },
+        }
+        self._call(
+            http, "webhook", "POST", "/telegram/webhook/", json=update,
+            headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET},
+        )
+        if session_id:
+            self.started.append(session_id)
+
+    def client(self, seed: int) -> None:
+        rng = random.Random(seed)
+        with requests.Session() as http:
+            while not self.stop.is_set():
+                endpoint = rng.choices(self.endpoints, self.weights)[0]
+                getattr(self, endpoint)(http, rng)
+
+    def bursts(self, seed: int) -> None:
+        rng = random.Random(seed)
+        while not self.stop.wait(self.args.burst_every):
+            # Fresh connections per burst: idle keep-alives would be closed by
+            # gunicorn between bursts and show up as connection errors
+            sessions = [requests.Session() for _ in range(self.args.burst_size)]
+            threads = [
+                threading.Thread(target=self.webhook, args=(http, random.Random(rng.random())))
+                for http in sessions
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for http in sessions:
+                http.close()
+
+
+def _run_traffic(args: argparse.Namespace, base_url: str) -> Dict[str, dict]:
+    recorder = _Recorder()
+    traffic = _Traffic(args, base_url, recorder)
+    threads = [
+        threading.Thread(target=traffic.client, args=(args.seed + index,), daemon=True)
+        for index in range(args.concurrency)
+    ]
+    if args.burst_size:
+        threads.append(threading.Thread(target=traffic.bursts, args=(args.seed - 1,), daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    traffic.stop.set()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def _compare(previous: dict, current: dict) -> None:
+    print(f"\nvs {previous['revision']} ({previous['started_at']}):")
+    for endpoint, row in current["endpoints"].items():
+        old = previous["endpoints"].get(endpoint)
+        if not old:
+            continue
+        deltas = [
+            f"{metric} {(row[metric] / old[metric] - 1) * 100:+6.1f}%"
+            for metric in ("rps", "p50_ms", "p99_ms")
+            if old.get(metric)
+        ]
+        print(f"  {endpoint:<16} " + "  ".join(deltas))
+    old_peak, new_peak = previous["server"].get("rss_peak_mb"), current["server"].get("rss_peak_mb")
+    if old_peak and new_peak:
+        print(f"  {'server rss':<16} peak {(new_peak / old_peak - 1) * 100:+6.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights: send, subscribe, session, webhook")
+    parser.add_argument("--photos", type=int, default=2)
+    parser.add_argument("--photo-mb", type=float, default=1.0)
+    parser.add_argument("--burst-size", type=int, default=20, help="simultaneous /start updates per burst (0 = off)")
+    parser.add_argument("--burst-every", type=float, default=5.0)
+    parser.add_argument("--session-wait", type=float, default=0.0, help="long-poll wait for /telegram/session/")
+    parser.add_argument("--celery", choices=("stub", "eager"), default="stub")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--s3-latency-ms", type=float, default=2.0)
+    parser.add_argument("--smtp-latency-ms", type=float, default=1.0)
+    parser.add_argument("--http-latency-ms", type=float, default=30.0)
+    parser.add_argument("--provider-limits", action="store_true")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR / "load")
+    args = parser.parse_args()
+
+    from benchmarks.fake_s3 import FakeS3Server
+    from benchmarks.smtp_sink import SmtpSink
+    from benchmarks.stub_http import StubProviderServer
+
+    s3 = FakeS3Server(latency=args.s3_latency_ms / 1000).start()
+    smtp = SmtpSink(latency=args.smtp_latency_ms / 1000).start()
+    stub = StubProviderServer(latency=args.http_latency_ms / 1000).start()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _start_server(args, child_env(args, s3, smtp, stub), os.path.join(tmp, "load.sqlite3"), port)
+        sampler = _MemorySampler(server.pid)
+        try:
+            _wait_ready(base_url, server)
+            sampler.sample()
+            sampler.start()
+            endpoints = _run_traffic(args, base_url)
+            sampler.sample()
+        finally:
+            sampler.stopped.set()
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+            s3.stop()
+            smtp.stop()
+            stub.stop()
+
+    run = {
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": {key: str(value) for key, value in vars(args).items()},
+        "endpoints": endpoints,
+        "server": sampler.summary(),
+        "deliveries": {"emails": smtp.messages, "provider_calls": sum(stub.requests.values())},
+    }
+
+    for endpoint, row in endpoints.items():
+        print(
+            f"{endpoint:<16} n={row['requests']:6d} rps={row['rps']:7.1f} "
+            f"err={row['error_rate'] * 100:5.1f}% p50={row['p50_ms']:7.1f} ms "
+            f"p95={row['p95_ms']:7.1f} ms p99={row['p99_ms']:7.1f} ms max={row['max_ms']:7.1f} ms "
+            f"{' '.join(f'{status}:{count}' for status, count in sorted(row['statuses'].items()))}"
+        )
+    server_row = run["server"]
+    if server_row:
+        print(
+            f"server: {server_row['processes']} processes, rss start={server_row['rss_start_mb']:.1f} MB "
+            f"peak={server_row['rss_peak_mb']:.1f} MB end={server_row['rss_end_mb']:.1f} MB"
+        )
+    print(f"deliveries: emails={smtp.messages} provider_calls={run['deliveries']['provider_calls']}")
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    previous = sorted(args.results_dir.glob("*.json"))
+    path = args.results_dir / f"{run['started_at'].replace(':', '')}-{run['revision']}.json"
+    path.write_text(json.dumps(run, indent=2))
+    print(f"\nsaved {path}")
+    if previous:
+        _compare(json.loads(previous[-1].read_text()), run)
+
+
+if __name__ == "__main__":
+    main()
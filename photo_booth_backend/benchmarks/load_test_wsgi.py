@@ -0,0 +1,27 @@
+"""
+WSGI entry point for ``benchmarks.load_test``.
+
+Loaded once in the gunicorn master (``--preload``): points Django at the
+throwaway SQLite database in LOAD_TEST_DB, migrates it and switches Celery
+to eager mode when LOAD_TEST_CELERY=eager. In stubbed mode the parent sets
+CELERY_BROKER_URL=memory:// so ``.delay()`` only enqueues in-process.
+"""
+import os
+
+from django.conf import settings
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "photo_booth_backend.settings")
+settings.DATABASES["default"]["NAME"] = os.environ["LOAD_TEST_DB"]
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+
+from photo_booth_backend.celery import celery_app  # noqa: E402
+from photo_booth_backend.wsgi import application  # noqa: E402,F401
+
+call_command("migrate", verbosity=0)
+# Workers are forked after this; none may inherit the master's connection
+connections.close_all()
+
+if os.getenv("LOAD_TEST_CELERY") == "eager":
+    celery_app.conf.task_always_eager = True
@@ -0,0 +1,250 @@
+"""
+Offline end-to-end throughput of the delivery tasks.
+
+Everything runs locally: the fake S3 server stands in for MinIO, an SMTP
+sink for the mail provider and the stub HTTP server for the Telegram Bot API
+and Twilio, each with configurable latency. The stand-ins live in this
+process; every scenario runs the real Celery tasks (eagerly, against a
+throwaway SQLite database) in a fresh child process, so its peak RSS covers
+the pipeline only.
+
+Scenarios:
+  photos_<channel>     send_photos_task with --photos JPEGs of ~--photo-mb each,
+                       --tasks runs at --concurrency (email, telegram, sms)
+  broadcast_email_<N>  send_broadcast_email_task to N subscribers
+  notify_<N>           send_general_notification_task to N subscribers,
+                       Telegram for the ~20% with a chat id
+
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --scenarios photos_email --tasks 40 --concurrency 4
+    python -m benchmarks.pipeline --subscribers 10000,100000
+
+Each run is written to --results-dir as JSON and compared with the previous one.
+Provider rate limits are lifted unless --provider-limits is given, so the
+numbers show the pipeline rather than Telegram's 30 messages/s.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.common import (
+    RESULTS_DIR,
+    child_env,
+    git_revision,
+    percentile,
+    synthetic_jpeg,
+    unique_photo,
+)
+
+# --- child side: runs one scenario against the stand-ins -----------------
+
+
+def _setup_django(db_path: str) -> None:
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+    from django.core.management import call_command
+
+    from photo_booth_backend.celery import celery_app
+
+    call_command("migrate", verbosity=0)
+    celery_app.conf.task_always_eager = True
+    celery_app.conf.task_eager_propagates = True
+
+
+def _seed_subscribers(count: int) -> None:
+    from notifications.models import Subscriber
+
+    Subscriber.objects.bulk_create(
+        (
+            Subscriber(
+                email=f"user{i}@example.com",
+                telegram_chat_id=str(100000 + i) if i % 5 == 0 else None,
+            )
+            for i in range(count)
+        ),
+        batch_size=5000,
+    )
+
+
+def _run_photos(channel: str, args: argparse.Namespace) -> Dict[str, float]:
+    from notifications.tasks import send_photos_task
+
+    recipient = {"email": "guest@example.com", "telegram": "123456", "sms": "+15550001111"}[channel]
+    bases = [synthetic_jpeg(args.photo_mb, seed) for seed in range(args.photos)]
+    sessions = [
+        ["data:image/jpeg;base64," + base64.b64encode(unique_photo(photo)).decode() for photo in bases]
+        for _ in range(args.tasks)
+    ]
+
+    def run(photos: List[str]) -> float:
+        started = time.perf_counter()
+        result = send_photos_task.apply(
+            kwargs={"recipient": recipient, "photos": photos, "preferred_method": channel}
+        ).result
+        assert result["queued"], result
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(run, sessions))
+    elapsed = time.perf_counter() - started
+    return {
+        "tasks": args.tasks,
+        "elapsed_s": elapsed,
+        "tasks_per_s": args.tasks / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def _run_broadcast(kind: str, subscribers: int) -> Dict[str, float]:
+    from notifications.tasks import send_broadcast_email_task, send_general_notification_task
+
+    _seed_subscribers(subscribers)
+    started = time.perf_counter()
+    if kind == "broadcast_email":
+        result = send_broadcast_email_task.apply(args=("Benchmark", "Hello from the benchmark")).result
+        assert result["sent"] == subscribers, result
+    else:
+        send_general_notification_task.apply(
+            args=("Benchmark", "Hello from the benchmark"), kwargs={"include_telegram": True}
+        )
+    elapsed = time.perf_counter() - started
+    return {"tasks": 1, "elapsed_s": elapsed, "tasks_per_s": 1 / elapsed, "subscribers": subscribers}
+
+
+def _child(scenario: str, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup_django(os.path.join(tmp, "bench.sqlite3"))
+        kind, _, param = scenario.rpartition("_")
+        if scenario.startswith("photos_"):
+            result = _run_photos(param, args)
+        else:
+            result = _run_broadcast(kind, int(param))
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+# --- parent side: stand-ins, orchestration and stored results ------------
+
+
+def _compare(previous: dict, current: dict) -> None:
+    print(f"\nvs {previous['revision']} ({previous['started_at']}):")
+    before = {row["scenario"]: row for row in previous["results"]}
+    for row in current["results"]:
+        old = before.get(row["scenario"])
+        if not old:
+            continue
+        deltas = []
+        for metric in ("tasks_per_s", "p99_ms", "peak_rss_mb"):
+            if old.get(metric) and metric in row:
+                deltas.append(f"{metric} {(row[metric] / old[metric] - 1) * 100:+6.1f}%")
+        print(f"  {row['scenario']:<24} " + "  ".join(deltas))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="", help="comma-separated subset of scenario names")
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--photos", type=int, default=4)
+    parser.add_argument("--photo-mb", type=float, default=2.0)
+    parser.add_argument("--subscribers", default="10000")
+    parser.add_argument("--s3-latency-ms", type=float, default=2.0)
+    parser.add_argument("--smtp-latency-ms", type=float, default=1.0)
+    parser.add_argument("--http-latency-ms", type=float, default=30.0)
+    parser.add_argument("--provider-limits", action="store_true")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args)
+        return
+
+    from benchmarks.fake_s3 import FakeS3Server
+    from benchmarks.smtp_sink import SmtpSink
+    from benchmarks.stub_http import StubProviderServer
+
+    scenarios = [f"photos_{channel}" for channel in ("email", "telegram", "sms")]
+    for size in args.subscribers.split(","):
+        scenarios += [f"broadcast_email_{size}", f"notify_{size}"]
+    if args.scenarios:
+        wanted = set(args.scenarios.split(","))
+        scenarios = [name for name in scenarios if name in wanted]
+
+    s3 = FakeS3Server(latency=args.s3_latency_ms / 1000).start()
+    smtp = SmtpSink(latency=args.smtp_latency_ms / 1000).start()
+    stub = StubProviderServer(latency=args.http_latency_ms / 1000).start()
+    env = child_env(args, s3, smtp, stub)
+    child_args = [
+        f"--tasks={args.tasks}", f"--concurrency={args.concurrency}",
+        f"--photos={args.photos}", f"--photo-mb={args.photo_mb}",
+    ]
+
+    run = {
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": {key: str(value) for key, value in vars(args).items() if key != "child"},
+        "results": [],
+    }
+    try:
+        for scenario in scenarios:
+            mails_before, http_before = smtp.messages, sum(stub.requests.values())
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.pipeline", f"--child={scenario}", *child_args],
+                env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{scenario}: failed\n{proc.stderr[-2000:]}")
+                continue
+            row = {"scenario": scenario, **json.loads(proc.stdout.strip().splitlines()[-1])}
+            row["emails"] = smtp.messages - mails_before
+            row["provider_calls"] = sum(stub.requests.values()) - http_before
+            if "subscribers" in row:
+                row["messages_per_s"] = (row["emails"] + row["provider_calls"]) / row["elapsed_s"]
+            run["results"].append(row)
+            line = (
+                f"{scenario:<24} tasks/s={row['tasks_per_s']:8.2f} "
+                f"elapsed={row['elapsed_s']:7.2f} s peak_rss={row['peak_rss_mb']:7.1f} MB"
+            )
+            if "p50_ms" in row:
+                line += f" p50={row['p50_ms']:8.1f} ms p99={row['p99_ms']:8.1f} ms"
+            if "messages_per_s" in row:
+                line += f" msgs/s={row['messages_per_s']:8.1f}"
+            print(line)
+    finally:
+        s3.stop()
+        smtp.stop()
+        stub.stop()
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    previous = sorted(args.results_dir.glob("*.json"))
+    path = args.results_dir / f"{run['started_at'].replace(':', '')}-{run['revision']}.json"
+    path.write_text(json.dumps(run, indent=2))
+    print(f"\nsaved {path}")
+    if previous:
+        _compare(json.loads(previous[-1].read_text()), run)
+
+
+if __name__ == "__main__":
+    main()
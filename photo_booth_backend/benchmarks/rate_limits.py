@@ -0,0 +1,73 @@
+"""
+Throughput against a provider that enforces its own rate limit.
+
+The stub answers 429 + ``retry_after`` above ``--ceiling`` requests/s, like
+Telegram's flood control. ``naive`` workers post and sleep out every 429;
+``limited`` workers go through ``services._provider_post``, which paces them
+with the shared token bucket in ``notifications.ratelimit``:
+
+    python -m benchmarks.rate_limits --messages 150 --workers 8 --ceiling 30
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_http import StubProviderServer
+from notifications.http_clients import get_session, provider_timeout
+from notifications.ratelimit import retry_after_seconds
+from notifications.services import _provider_post
+
+
+def _naive_post(url: str, payload: dict) -> None:
+    while True:
+        response = get_session("telegram").post(
+            url, json=payload, timeout=provider_timeout("telegram")
+        )
+        retry_after = retry_after_seconds(response)
+        if retry_after is None:
+            response.raise_for_status()
+            return
+        time.sleep(retry_after)
+
+
+def _limited_post(url: str, payload: dict) -> None:
+    while True:
+        response = _provider_post(
+            "telegram", "telegram", url, [("telegram", "")], json=payload
+        )
+        if response.status_code != 429:
+            response.raise_for_status()
+            return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--ceiling", type=float, default=30.0)
+    args = parser.parse_args()
+
+    # Pace slightly under the stub's ceiling, as one would under Telegram's
+    os.environ["TELEGRAM_RATE_PER_SECOND"] = str(args.ceiling * 0.95)
+    os.environ["TELEGRAM_RATE_BURST"] = "1"
+    os.environ.pop("CACHE_REDIS_URL", None)
+
+    for label, post in (("naive", _naive_post), ("limited", _limited_post)):
+        server = StubProviderServer(max_per_second=args.ceiling).start()
+        url = f"{server.base_url}/botTOKEN/sendMessage"
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                list(pool.map(lambda i: post(url, {"chat_id": str(i), "text": "hi"}), range(args.messages)))
+            elapsed = time.perf_counter() - started
+            print(
+                f"{label:<8} messages={args.messages} total={elapsed:6.2f} s "
+                f"rate={args.messages / elapsed:5.1f}/s 429s={server.rejected}"
+            )
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
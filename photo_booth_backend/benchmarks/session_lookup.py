@@ -0,0 +1,132 @@
+"""
+TelegramSession lookup latency as the table grows, before and after the
+0005 indexes.
+
+Rows are written straight into a throwaway SQLite database (90% already
+expired, like a table nobody purges). At each size the benchmark times the
+webhook's claim filter and the purge job's steady-state probe (an "expired
+ids" batch that finds nothing new) with the 0004 schema (plain session_id
+index) and the 0005 schema (composite claim index + expires_at index).
+Finally the batched purge runs over the largest table:
+
+    python -m benchmarks.session_lookup --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "photo_booth_backend.settings")
+os.environ.pop("POSTGRES_DB", None)
+
+
+def _setup(db_path: str) -> None:
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+
+def _insert(start: int, stop: int, now) -> list[str]:
+    from django.db import connection
+
+    rows = []
+    sampled = []
+    for i in range(start, stop):
+        session_id = uuid.uuid4().hex
+        expired = random.random() < 0.9
+        offset = random.uniform(60, 30 * 24 * 3600) if expired else -random.uniform(1, 900)
+        rows.append(
+            (session_id, f"@user{i}", "[]", "telegram", expired and random.random() < 0.5,
+             False, now - timedelta(seconds=offset + 900), now - timedelta(seconds=offset))
+        )
+        if i % 97 == 0:
+            sampled.append(session_id)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO notifications_telegramsession "
+            "(session_id, telegram_username, photos, preferred_method, is_linked, is_sent, created_at, expires_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+    return sampled
+
+
+def _time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(os.path.join(tmp, "sessions.sqlite3"))
+        from django.core.management import call_command
+        from django.db import transaction
+        from django.utils import timezone
+
+        from notifications.models import TelegramSession
+        from notifications.sessions import purge_expired_sessions
+
+        call_command("migrate", verbosity=0)
+        now = timezone.now()
+        # Older than every row: what the beat job sees once it has caught up
+        probe_cutoff = now - timedelta(days=31)
+        sampled: list[str] = []
+        total = 0
+
+        for size in sizes:
+            with transaction.atomic():
+                sampled += _insert(total, size, now)
+            total = size
+
+            def claim():
+                session_id = random.choice(sampled)
+                TelegramSession.objects.filter(
+                    session_id=session_id, is_linked=False, expires_at__gt=now
+                ).exists()
+
+            def purge_probe():
+                list(
+                    TelegramSession.objects.filter(expires_at__lt=probe_cutoff)
+                    .order_by()
+                    .values_list("id", flat=True)[:1000]
+                )
+
+            for schema in ("0004", "0005"):
+                call_command("migrate", "notifications", schema, verbosity=0)
+                print(
+                    f"rows={size:>9} schema={schema} "
+                    f"claim={_time_ms(claim, args.lookups):7.3f} ms "
+                    f"purge-probe={_time_ms(purge_probe, 20):7.2f} ms"
+                )
+
+        started = time.perf_counter()
+        deleted, more = 0, True
+        while more:
+            batch_deleted, more = purge_expired_sessions()
+            deleted += batch_deleted
+        elapsed = time.perf_counter() - started
+        print(
+            f"purge: deleted={deleted} in {elapsed:.2f} s "
+            f"({deleted / elapsed:,.0f} rows/s), remaining={TelegramSession.objects.count()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
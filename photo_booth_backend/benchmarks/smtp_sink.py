@@ -0,0 +1,97 @@
+"""
+Local SMTP sink for offline benchmarks.
+
+Speaks just enough SMTP for Django's SMTP backend without TLS or AUTH
+(EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) and discards every message
+after counting it. ``latency`` is added once per accepted message, standing
+in for the provider's queueing time.
+"""
+import socketserver
+import threading
+import time
+from typing import Tuple
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SmtpSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def record(self, recipients: int, size: int) -> None:
+        with self._lock:
+            self.messages += 1
+            self.recipients += recipients
+            self.bytes += size
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+    server: SmtpSink
+
+    def _send(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        with self.server._lock:
+            self.server.connections += 1
+        self._send("220 sink ESMTP")
+        recipients = 0
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode("latin-1").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+            elif verb == "HELO":
+                self._send("250 sink")
+            elif verb == "MAIL":
+                recipients = 0
+                self._send("250 OK")
+            elif verb == "RCPT":
+                recipients += 1
+                self._send("250 OK")
+            elif verb == "DATA":
+                self._send("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for line in iter(self.rfile.readline, b""):
+                    if line == b".\r\n":
+                        break
+                    size += len(line)
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                self.server.record(recipients, size)
+                self._send("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                recipients = 0 if verb == "RSET" else recipients
+                self._send("250 OK")
+            elif verb == "QUIT":
+                self._send("221 Bye")
+                return
+            else:
+                self._send("502 Command not implemented")
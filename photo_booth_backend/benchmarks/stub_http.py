@@ -0,0 +1,138 @@
+"""
+Stub HTTP server mimicking the Telegram Bot API and Twilio Messages API.
+
+Responses are canned JSON shaped like the real providers. ``latency`` is
+added to every request and ``connect_latency`` once per new TCP connection,
+which models the TCP/TLS handshake cost that keep-alive pooling avoids.
+With ``max_per_second`` set, requests over that rate (per rolling second)
+get a 429 carrying Telegram's ``retry_after`` and a ``Retry-After`` header.
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+class StubProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        max_per_second: float = 0.0,
+        retry_after: int = 1,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.max_per_second = max_per_second
+        self.retry_after = retry_after
+        self.connections = 0
+        self.rejected = 0
+        self.requests: Dict[str, int] = {}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubProviderServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def count(self, method: str) -> None:
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def over_limit(self) -> bool:
+        if not self.max_per_second:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_second:
+                self.rejected += 1
+                return True
+            self._recent.append(now)
+            return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: StubProviderServer
+
+    def log_message(self, format, *args):  # noqa: A002 - silence request logging
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def _reply(self, status: int, payload: dict, headers: Dict[str, str] | None = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = self.path.split("?", 1)[0]
+        method = path.rsplit("/", 1)[-1]
+        if self.server.over_limit():
+            retry_after = self.server.retry_after
+            self._reply(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                },
+                headers={"Retry-After": str(retry_after)},
+            )
+            return
+        self.server.count(method)
+        next_id = next(self.server._ids)
+
+        if path.endswith("/Messages.json"):
+            self._reply(201, {"sid": f"SM{next_id:032d}", "status": "queued"})
+        elif method == "sendMediaGroup":
+            # Real responses carry one message per album item; a single one suffices here
+            self._reply(200, {"ok": True, "result": [_photo_message(next_id)]})
+        elif method == "sendPhoto":
+            self._reply(200, {"ok": True, "result": _photo_message(next_id)})
+        else:
+            self._reply(200, {"ok": True, "result": {"message_id": next_id}})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def _photo_message(message_id: int) -> dict:
+    return {"message_id": message_id, "photo": [{"file_id": f"stub-file-{message_id}"}]}
@@ -0,0 +1,106 @@
+"""
+Subscriber import rate: one /subscribe/ request per address versus the bulk
+/subscribers/import/ endpoint.
+
+Runs in-process against a throwaway SQLite database through Django's test
+client, so the numbers cover the views and the database, not the network.
+--compare addresses go through /subscribe/; then --rows addresses (20% with
+a Telegram chat id) are imported as CSV and as NDJSON into an empty table,
+and the CSV once more on top of itself (updates for the rows with a chat
+id, the rest unchanged):
+
+    python -m benchmarks.subscriber_import --rows 200000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "photo_booth_backend.settings")
+os.environ.pop("POSTGRES_DB", None)
+
+
+def _setup(db_path: str) -> None:
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    django.setup()
+
+
+def _csv(rows: int) -> bytes:
+    lines = ["email,telegram_chat_id"]
+    lines += [f"user{i}@example.com,{100000 + i if i % 5 == 0 else ''}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _ndjson(rows: int) -> bytes:
+    lines = []
+    for i in range(rows):
+        row = {"email": f"user{i}@example.com"}
+        if i % 5 == 0:
+            row["telegram_chat_id"] = str(100000 + i)
+        lines.append(json.dumps(row))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--compare", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["SUBSCRIBER_IMPORT_TOKEN"] = "benchmark"
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(os.path.join(tmp, "import.sqlite3"))
+        from django.core.management import call_command
+        from django.test import Client
+
+        from notifications.models import Subscriber
+
+        call_command("migrate", verbosity=0)
+        client = Client()
+
+        started = time.perf_counter()
+        for i in range(args.compare):
+            response = client.post(
+                "/api/notifications/subscribe/",
+                {"email": f"single{i}@example.com", "telegram_chat_id": str(i)},
+                content_type="application/json",
+            )
+            assert response.status_code == 200, response.content
+        per_request = args.compare / (time.perf_counter() - started)
+        print(f"/subscribe/ one by one: {per_request:9,.0f} rows/s")
+        Subscriber.objects.all().delete()
+
+        runs = [
+            ("csv, empty table", "text/csv", _csv),
+            ("ndjson, empty table", "application/x-ndjson", _ndjson),
+            ("csv, all existing", "text/csv", _csv),
+        ]
+        for label, content_type, build in runs:
+            if label.endswith("empty table"):
+                Subscriber.objects.all().delete()
+            body = build(args.rows)
+            started = time.perf_counter()
+            response = client.post(
+                "/api/notifications/subscribers/import/",
+                body,
+                content_type=content_type,
+                headers={"Authorization": "Bearer benchmark"},
+            )
+            elapsed = time.perf_counter() - started
+            report = response.json()
+            assert response.status_code == 200 and not report["invalid"], report
+            print(
+                f"/subscribers/import/ {label:<20} {args.rows / elapsed:9,.0f} rows/s "
+                f"({args.rows / elapsed / per_request:.0f}x) "
+                f"inserted={report['inserted']} updated={report['updated']} "
+                f"unchanged={report['unchanged']} in {elapsed:.1f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare sequential vs bounded-parallel ``upload_photos_and_presign``.
+
+Runs against an in-process fake S3 with an artificial per-request latency,
+so the numbers show round-trip behaviour rather than disk or CPU cost:
+
+    python -m benchmarks.upload_concurrency --photos 8 --latency-ms 50
+"""
+import argparse
+import base64
+import os
+import statistics
+import time
+
+from benchmarks.fake_s3 import FakeS3Server
+
+
+def _data_url(size: int) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(os.urandom(size)).decode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--photos", type=int, default=8)
+    parser.add_argument("--photo-kb", type=int, default=256)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    server = FakeS3Server(latency=args.latency_ms / 1000).start()
+    os.environ["MINIO_ENDPOINT"] = server.endpoint
+    os.environ["MINIO_PUBLIC_ENDPOINT"] = server.endpoint
+    os.environ["MINIO_USE_SSL"] = "false"
+
+    from notifications.storage import upload_photos_and_presign
+
+    upload_photos_and_presign([_data_url(1024)])  # warm up bucket + connection pool
+
+    try:
+        for label, workers in (("sequential", 1), ("parallel", args.workers)):
+            timings = []
+            for _ in range(args.repeat):
+                # Fresh bytes every run: identical content would be deduplicated
+                photos = [_data_url(args.photo_kb * 1024) for _ in range(args.photos)]
+                started = time.perf_counter()
+                urls = upload_photos_and_presign(photos, max_workers=workers)
+                timings.append(time.perf_counter() - started)
+                assert len(urls) == args.photos
+            median = statistics.median(timings)
+            print(
+                f"{label:<11} workers={workers:<2} photos={args.photos} "
+                f"median={median * 1000:8.1f} ms  (~{median / (args.latency_ms / 1000):.1f} x RTT)"
+            )
+
+        # Kiosk resubmit / task retry: same bytes again, served from the stored-key index
+        requests_before = server.request_count
+        started = time.perf_counter()
+        upload_photos_and_presign(photos, max_workers=args.workers)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'resubmit':<11} workers={args.workers:<2} photos={args.photos} "
+            f"total={elapsed * 1000:8.1f} ms  storage requests={server.request_count - requests_before}"
+        )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import time
+from typing import List
+
+from django.core.cache import cache
+
+# Breaker state lives in the Django cache: shared across workers with
+# CACHE_REDIS_URL, per process with the local-memory fallback.
+
+
+def _failure_threshold() -> int:
+    return int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+
+def _reset_seconds() -> int:
+    return int(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one delivery channel.
+
+    closed: calls pass; ``CIRCUIT_FAILURE_THRESHOLD`` failures in a row open it.
+    open: calls are rejected for ``CIRCUIT_RESET_SECONDS``.
+    half-open: afterwards a single trial call is let through (claimed with
+    ``cache.add`` so only one worker gets it); success closes, failure re-opens.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._failures_key = f"circuit:{name}:failures"
+        self._opened_key = f"circuit:{name}:opened_at"
+        self._trial_key = f"circuit:{name}:trial"
+
+    def allow(self) -> bool:
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            return True
+        if time.time() - opened_at < _reset_seconds():
+            return False
+        return cache.add(self._trial_key, 1, timeout=_reset_seconds())
+
+    def is_open(self) -> bool:
+        opened_at = cache.get(self._opened_key)
+        return opened_at is not None and time.time() - opened_at < _reset_seconds()
+
+    def record_success(self) -> None:
+        cache.delete_many([self._failures_key, self._opened_key, self._trial_key])
+
+    def record_failure(self) -> None:
+        cache.add(self._failures_key, 0, timeout=None)
+        failures = cache.incr(self._failures_key)
+        if failures >= _failure_threshold() or cache.get(self._opened_key) is not None:
+            cache.set(self._opened_key, time.time(), timeout=None)
+            cache.delete(self._trial_key)
+
+    def state(self) -> dict:
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            status = "closed"
+        elif time.time() - opened_at < _reset_seconds():
+            status = "open"
+        else:
+            status = "half_open"
+        return {
+            "channel": self.name,
+            "state": status,
+            "consecutive_failures": cache.get(self._failures_key, 0),
+            "opened_at": opened_at,
+        }
+
+
+def get_breaker(channel: str) -> CircuitBreaker:
+    return CircuitBreaker(channel)
+
+
+def breaker_states(channels: List[str]) -> List[dict]:
+    return [get_breaker(channel).state() for channel in channels]
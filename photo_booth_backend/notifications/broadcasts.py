@@ -0,0 +1,101 @@
+import os
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Max, Min
+
+from .models import Subscriber
+
+# Progress lives in the Django cache so any web or worker process can read it;
+# use CACHE_REDIS_URL when shards run on more than one worker.
+
+
+def _ttl() -> int:
+    return int(os.getenv("BROADCAST_PROGRESS_TTL", str(24 * 3600)))
+
+
+def _shard_size() -> int:
+    return max(1, int(os.getenv("BROADCAST_SHARD_SIZE", "5000")))
+
+
+def _key(broadcast_id: str, suffix: str = "") -> str:
+    return f"broadcast:{broadcast_id}{':' + suffix if suffix else ''}"
+
+
+def plan_shards(shard_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split the subscriber table into half-open primary key ranges."""
+    bounds = Subscriber.objects.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return []
+    size = shard_size or _shard_size()
+    return [
+        (start, min(start + size, bounds["high"] + 1))
+        for start in range(bounds["low"], bounds["high"] + 1, size)
+    ]
+
+
+def start_broadcast(broadcast_id: str, shards: List[Tuple[int, int]], options: dict) -> None:
+    cache.set(_key(broadcast_id), {"shards": len(shards), **options}, timeout=_ttl())
+    cache.set(_key(broadcast_id, "done"), 0, timeout=_ttl())
+
+
+def record_shard_progress(broadcast_id: str, shard_index: int, progress: dict) -> None:
+    cache.set(_key(broadcast_id, f"shard:{shard_index}"), progress, timeout=_ttl())
+
+
+def finish_shard(broadcast_id: str) -> bool:
+    """Count a finished shard; True for the shard that completes the broadcast."""
+    meta = cache.get(_key(broadcast_id)) or {}
+    done = cache.incr(_key(broadcast_id, "done"))
+    return done >= meta.get("shards", 0)
+
+
+def summarize_broadcast(broadcast_id: str) -> dict:
+    """Merge per-shard results into the summary returned to callers."""
+    meta = cache.get(_key(broadcast_id)) or {}
+    shard_keys = [_key(broadcast_id, f"shard:{idx}") for idx in range(meta.get("shards", 0))]
+    shards = cache.get_many(shard_keys)
+
+    summary = {
+        "recipients": 0,
+        "email": {"sent": 0, "failed": []},
+        "telegram": {"sent": 0, "failed": []} if meta.get("include_telegram") else None,
+        "sms_simulated": 0,
+    }
+    for shard in shards.values():
+        summary["recipients"] += shard["processed"]
+        summary["email"]["sent"] += shard["email"]["sent"]
+        summary["email"]["failed"] += shard["email"]["failed"]
+        if summary["telegram"] is not None:
+            summary["telegram"]["sent"] += shard["telegram"]["sent"]
+            summary["telegram"]["failed"] += shard["telegram"]["failed"]
+    if meta.get("include_sms"):
+        summary["sms_simulated"] = summary["recipients"]
+
+    cache.set(_key(broadcast_id, "summary"), summary, timeout=_ttl())
+    return summary
+
+
+def get_broadcast_status(broadcast_id: str) -> Optional[dict]:
+    meta = cache.get(_key(broadcast_id))
+    if meta is None:
+        return None
+    shard_keys = [_key(broadcast_id, f"shard:{idx}") for idx in range(meta["shards"])]
+    shards = cache.get_many(shard_keys)
+    return {
+        "broadcast_id": broadcast_id,
+        "shards_total": meta["shards"],
+        "shards_done": cache.get(_key(broadcast_id, "done"), 0),
+        "shards": [
+            {
+                "shard": idx,
+                "status": shards[key]["status"],
+                "processed": shards[key]["processed"],
+                "email_sent": shards[key]["email"]["sent"],
+                "email_failed": len(shards[key]["email"]["failed"]),
+            }
+            for idx, key in enumerate(shard_keys)
+            if key in shards
+        ],
+        "summary": cache.get(_key(broadcast_id, "summary")),
+    }
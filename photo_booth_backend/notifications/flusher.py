@@ -0,0 +1,49 @@
+import threading
+from typing import Callable, Optional
+
+from django.conf import settings
+
+
+class Flusher:
+    """
+    Daemon thread behind a per-process write-behind buffer (metrics, the
+    delivery ledger): calls ``flush`` every ``interval()`` seconds, or as soon
+    as ``wake()`` is called. It is started on first use; keep the owning
+    buffer in a ProcessLocal so a forked child starts its own thread.
+
+    Flushes write through Django, so a process without configured settings
+    (a standalone benchmark importing services) starts no thread and keeps
+    its records until an explicit flush.
+
+    A failed flush is printed and retried on the next round: buffering must
+    never break the request or task that recorded the data.
+    """
+
+    def __init__(self, name: str, flush: Callable[[], object], interval: Callable[[], float]) -> None:
+        self.name = name
+        self._flush = flush
+        self._interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is None and settings.configured:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def wake(self) -> None:
+        """Flush now instead of at the end of the current interval."""
+        self.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._interval())
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except Exception as exc:  # noqa: BLE001 - see class docstring
+                print(f"{self.name} flush failed: {exc}")
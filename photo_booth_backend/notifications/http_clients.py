@@ -0,0 +1,73 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .process_local import ProcessLocal
+
+# (connect, read) seconds per provider call type
+PROVIDER_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "telegram": (5, 10),
+    "telegram_upload": (5, 30),
+    "twilio": (5, 10),
+    "minio": (3, 10),
+}
+
+
+def _new_session(provider: str) -> requests.Session:
+    pool_size = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_sessions: ProcessLocal[requests.Session] = ProcessLocal(_new_session)
+
+
+def get_session(provider: str) -> requests.Session:
+    """
+    Process-wide keep-alive session for one provider (telegram, twilio, minio).
+
+    Connections are pooled per host (``HTTP_POOL_MAXSIZE`` sockets, default 10),
+    so repeated calls skip the TCP/TLS handshake.
+    """
+    return _sessions.get(provider)
+
+
+# Absolute time.time() by which the current delivery must finish, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("delivery_deadline", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Cap every provider timeout inside the block by the remaining budget."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def provider_timeout(name: str) -> Tuple[float, float]:
+    connect, read = PROVIDER_TIMEOUTS[name]
+    remaining = remaining_budget()
+    if remaining is None:
+        return connect, read
+    if remaining <= 0:
+        raise DeadlineExceeded("delivery deadline exceeded")
+    return min(connect, remaining), min(read, remaining)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+from django.http import JsonResponse
+
+# Replayed responses for repeated /send/ requests. Entries live in the Django
+# cache (shared through Redis with CACHE_REDIS_URL) and are evicted by age
+# (the TTLs below) and by count: every new key takes the next slot of a ring
+# of IDEMPOTENCY_MAX_ENTRIES and pushes out whichever key held that slot.
+
+PENDING = "pending"
+
+
+def _key_ttl() -> int:
+    # Client-supplied Idempotency-Key: the client retries on purpose
+    return int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+
+
+def _hash_ttl() -> int:
+    # Server-computed hash: only absorbs double taps and quick retries, so a
+    # deliberate resend of the same photos a bit later still goes through
+    return int(os.getenv("IDEMPOTENCY_HASH_TTL", "120"))
+
+
+def _pending_ttl() -> int:
+    # Lease on an in-flight request: covers the replay wait plus one request,
+    # so a worker that dies mid-request blocks retries for seconds, not a day
+    return int(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))
+
+
+def _max_entries() -> int:
+    return int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+def request_key(header: Optional[str], fields: dict, files: Iterable = ()) -> tuple[str, int]:
+    """
+    Cache key and TTL for one /send/ request: the ``Idempotency-Key`` header
+    when the client sent one, otherwise a SHA-256 of the request fields and
+    uploaded file bytes.
+    """
+    if header:
+        digest = hashlib.sha256(header.strip().encode()).hexdigest()
+        return f"idempotency:key:{digest}", _key_ttl()
+
+    sha = hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode())
+    for upload in files:
+        for chunk in upload.chunks():
+            sha.update(chunk)
+        upload.seek(0)
+    return f"idempotency:hash:{sha.hexdigest()}", _hash_ttl()
+
+
+def _take_slot(key: str) -> None:
+    cache.add("idempotency:seq", 0, timeout=None)
+    slot = f"idempotency:slot:{cache.incr('idempotency:seq') % _max_entries()}"
+    evicted = cache.get(slot)
+    cache.set(slot, key, timeout=None)
+    if evicted and evicted != key:
+        cache.delete(evicted)
+
+
+def _replay(entry: dict) -> JsonResponse:
+    response = JsonResponse(entry["body"], status=entry["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def begin(key: str, ttl: int) -> Optional[JsonResponse]:
+    """
+    Claim ``key`` for this request and return None, or return the response
+    to replay when an earlier request owns it. A request that is still in
+    flight is waited for up to ``IDEMPOTENCY_WAIT_SECONDS``, then 409. The
+    claim expires after ``IDEMPOTENCY_PENDING_TTL``; ``ttl`` only applies to
+    the stored response (see finish).
+    """
+    if cache.add(key, PENDING, timeout=min(ttl, _pending_ttl())):
+        _take_slot(key)
+        return None
+
+    deadline = time.monotonic() + float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    while True:
+        entry = cache.get(key)
+        if entry is None:
+            # The first attempt failed and released the key: this one runs
+            return begin(key, ttl)
+        if entry != PENDING:
+            return _replay(entry)
+        if time.monotonic() >= deadline:
+            return JsonResponse(
+                {"error": "An identical request is still being processed"}, status=409
+            )
+        time.sleep(0.1)
+
+
+def finish(key: str, ttl: int, response: JsonResponse) -> None:
+    """Store a successful response for replay; release the key otherwise."""
+    if 200 <= response.status_code < 300:
+        entry = {"status": response.status_code, "body": json.loads(response.content)}
+        cache.set(key, entry, timeout=ttl)
+    else:
+        cache.delete(key)
+
+
+def release(key: str) -> None:
+    cache.delete(key)
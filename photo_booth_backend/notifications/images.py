@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; photos are then delivered as-is
+    Image = None
+    ImageOps = None
+
+from .process_local import ProcessLocal
+
+# Per-channel renditions: longest side in px (None keeps the size) and JPEG quality
+VARIANTS: Dict[str, Dict[str, Optional[int]]] = {
+    "email": {"max_side": None, "quality": 92},
+    # Used when the full-size email rendition exceeds EMAIL_ATTACHMENT_MAX_BYTES
+    "email_reduced": {"max_side": 2560, "quality": 85},
+    "telegram": {"max_side": 1280, "quality": 85},
+}
+
+
+def render_variant(content: bytes, variant: str) -> bytes:
+    """
+    Re-encode a photo for one channel: apply EXIF orientation, drop all
+    metadata, downscale to ``max_side`` and save as progressive JPEG.
+    Pillow releases the GIL while decoding, resampling and encoding, so
+    renders in the thread pool run in parallel.
+    """
+    spec = VARIANTS[variant]
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        max_side = spec["max_side"]
+        if max_side and max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        # No exif= argument: metadata (GPS, device info) is not copied over
+        image.save(out, "JPEG", quality=spec["quality"], optimize=True, progressive=True)
+    # Always the re-encode, even when it is not smaller than the source: the
+    # source still carries its EXIF (GPS, device, orientation)
+    return out.getvalue()
+
+
+class _VariantCache:
+    """LRU of rendered variants keyed by (sha256 of source, variant), bounded in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[str, str], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_cache = _VariantCache(int(os.getenv("IMAGE_VARIANT_CACHE_BYTES", str(128 * 1024 * 1024))))
+_pools: ProcessLocal[Executor] = ProcessLocal(
+    lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-render")
+)
+
+
+def _get_pool() -> Optional[Executor]:
+    # Threads, not processes: prefork Celery children are daemonic and may
+    # not fork, and every child already has a core's worth of work
+    workers = int(os.getenv("IMAGE_RENDER_THREADS", str(min(4, os.cpu_count() or 1))))
+    if workers <= 1:
+        return None
+    return _pools.get(workers)
+
+
+def _render_or_error(content: bytes, variant: str) -> object:
+    try:
+        return render_variant(content, variant)
+    except Exception as exc:  # noqa: BLE001 - fall back to the original
+        return exc
+
+
+def render_variants(contents: List[bytes], variant: str) -> List[bytes]:
+    """
+    Channel variants for a batch of photos, in input order.
+
+    Cache hits are served from memory; misses are rendered in a thread pool
+    (``IMAGE_RENDER_THREADS``, default up to 4). Without Pillow, or if a
+    photo cannot be decoded, the original bytes are returned.
+    """
+    if Image is None or variant not in VARIANTS:
+        return list(contents)
+
+    keys = [(hashlib.sha256(content).hexdigest(), variant) for content in contents]
+    results: List[Optional[bytes]] = [_cache.get(key) for key in keys]
+    missing = [idx for idx, result in enumerate(results) if result is None]
+    if not missing:
+        return results  # type: ignore[return-value]
+
+    rendered: Dict[int, object] = {}
+    pool = _get_pool() if len(missing) > 1 else None
+    if pool is not None:
+        try:
+            futures = {idx: pool.submit(_render_or_error, contents[idx], variant) for idx in missing}
+            rendered = {idx: future.result() for idx, future in futures.items()}
+        except RuntimeError:
+            # Pool shut down (interpreter exit): whatever is left renders inline
+            pass
+    for idx in missing:
+        if idx not in rendered:
+            rendered[idx] = _render_or_error(contents[idx], variant)
+
+    for idx, value in rendered.items():
+        if isinstance(value, BaseException):
+            results[idx] = contents[idx]
+            continue
+        _cache.put(keys[idx], value)
+        results[idx] = value
+    return results  # type: ignore[return-value]
@@ -0,0 +1,232 @@
+import os
+import threading
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .flusher import Flusher
+from .models import Delivery, DeliveryAttempt
+from .process_local import ProcessLocal
+
+# Delivery ledger: the status of every photo delivery and its channel
+# attempts, queryable by send_photos_task id or recipient.
+#
+# Tasks only append to a per-process buffer; a daemon thread writes it in
+# one transaction of bulk INSERTs every DELIVERY_LEDGER_FLUSH_SECONDS, or as
+# soon as DELIVERY_LEDGER_BATCH_SIZE records are pending. The "queued" row
+# is insert-only and the final outcome an upsert on task_id, so whichever
+# process flushes first, the row ends with the outcome. Records are visible
+# to status queries after the next flush; a killed worker loses its buffer.
+# Workers write and web reads, so both need the same database (PostgreSQL
+# under compose); with per-container SQLite every lookup would be a 404.
+
+RECIPIENT_LOOKUP_LIMIT = 100
+
+ERROR_MAX_LENGTH = 255
+
+
+def _flush_interval() -> float:
+    return float(os.getenv("DELIVERY_LEDGER_FLUSH_SECONDS", "2"))
+
+
+def _batch_size() -> int:
+    return max(1, int(os.getenv("DELIVERY_LEDGER_BATCH_SIZE", "500")))
+
+
+def _max_pending() -> int:
+    # Cap per record kind while the database is unreachable; the oldest
+    # records are dropped
+    return int(os.getenv("DELIVERY_LEDGER_MAX_PENDING", "50000"))
+
+
+def _background_flush() -> None:
+    # Long-lived thread: drop a connection the database has closed
+    close_old_connections()
+    flush()
+
+
+class _Buffer:
+    def __init__(self) -> None:
+        self.queued: Dict[str, Delivery] = {}
+        self.outcomes: Dict[str, Delivery] = {}
+        self.attempts: List[DeliveryAttempt] = []
+        self.lock = threading.Lock()
+        self.flusher = Flusher("Delivery ledger", _background_flush, _flush_interval)
+
+    def pending(self) -> int:
+        return len(self.queued) + len(self.outcomes) + len(self.attempts)
+
+
+# A forked worker child starts empty: the parent's records are the parent's to flush
+_buffers: ProcessLocal[_Buffer] = ProcessLocal(_Buffer)
+
+
+def _local() -> _Buffer:
+    return _buffers.get()
+
+
+def _added(buffer: _Buffer) -> None:
+    buffer.flusher.start()
+    if buffer.pending() >= _batch_size():
+        buffer.flusher.wake()
+
+
+def _newest(records: Dict[str, Delivery], limit: int) -> Dict[str, Delivery]:
+    if len(records) <= limit:
+        return records
+    return dict(list(records.items())[-limit:])
+
+
+def _timestamp(started_at: Optional[float]) -> datetime:
+    if started_at is None:
+        return timezone.now()
+    return datetime.fromtimestamp(started_at, tz=dt_timezone.utc)
+
+
+def record_queued(
+    task_id: Optional[str],
+    recipient: str,
+    preferred_method: str,
+    photo_count: int,
+    started_at: Optional[float] = None,
+) -> None:
+    if not task_id:
+        return
+    buffer = _local()
+    delivery = Delivery(
+        task_id=task_id,
+        recipient=recipient,
+        preferred_method=preferred_method,
+        photo_count=photo_count,
+        created_at=_timestamp(started_at),
+    )
+    with buffer.lock:
+        buffer.queued[task_id] = delivery
+    _added(buffer)
+
+
+def record_attempt(task_id: Optional[str], channel: str, success: bool, error: Optional[str] = None) -> None:
+    if not task_id:
+        return
+    buffer = _local()
+    attempt = DeliveryAttempt(
+        task_id=task_id,
+        channel=channel,
+        success=success,
+        error=error[:ERROR_MAX_LENGTH] if error else None,
+        created_at=timezone.now(),
+    )
+    with buffer.lock:
+        buffer.attempts.append(attempt)
+    _added(buffer)
+
+
+def record_outcome(
+    task_id: Optional[str],
+    recipient: str,
+    preferred_method: str,
+    photo_count: int,
+    success: bool,
+    channel: str,
+    started_at: Optional[float] = None,
+) -> None:
+    """Final status of a delivery, after its last channel attempt."""
+    if not task_id:
+        return
+    buffer = _local()
+    delivery = Delivery(
+        task_id=task_id,
+        recipient=recipient,
+        preferred_method=preferred_method,
+        photo_count=photo_count,
+        status=Delivery.STATUS_DELIVERED if success else Delivery.STATUS_FAILED,
+        channel=channel,
+        created_at=_timestamp(started_at),
+        completed_at=timezone.now(),
+    )
+    with buffer.lock:
+        buffer.outcomes[task_id] = delivery
+    _added(buffer)
+
+
+def flush() -> int:
+    """Write this process's pending records; returns how many were written."""
+    buffer = _local()
+    with buffer.lock:
+        queued, outcomes, attempts = buffer.queued, buffer.outcomes, buffer.attempts
+        buffer.queued, buffer.outcomes, buffer.attempts = {}, {}, []
+    if not (queued or outcomes or attempts):
+        return 0
+
+    batch_size = _batch_size()
+    try:
+        with transaction.atomic():
+            Delivery.objects.bulk_create(queued.values(), batch_size=batch_size, ignore_conflicts=True)
+            Delivery.objects.bulk_create(
+                outcomes.values(),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["task_id"],
+                update_fields=["status", "channel", "completed_at"],
+            )
+            DeliveryAttempt.objects.bulk_create(attempts, batch_size=batch_size)
+    except Exception:
+        for attempt in attempts:
+            attempt.pk = None
+        limit = _max_pending()
+        with buffer.lock:
+            # Put the batch back in front of anything recorded meanwhile
+            buffer.queued = _newest({**queued, **buffer.queued}, limit)
+            buffer.outcomes = _newest({**outcomes, **buffer.outcomes}, limit)
+            buffer.attempts = (attempts + buffer.attempts)[-limit:]
+        raise
+    return len(queued) + len(outcomes) + len(attempts)
+
+
+def _as_dict(delivery: Delivery, attempts: List[DeliveryAttempt]) -> dict:
+    return {
+        "task_id": delivery.task_id,
+        "recipient": delivery.recipient,
+        "preferred_method": delivery.preferred_method,
+        "status": delivery.status,
+        "channel": delivery.channel,
+        "photos": delivery.photo_count,
+        "created_at": delivery.created_at.isoformat(),
+        "completed_at": delivery.completed_at.isoformat() if delivery.completed_at else None,
+        "attempts": [
+            {
+                "channel": attempt.channel,
+                "success": attempt.success,
+                "error": attempt.error,
+                "at": attempt.created_at.isoformat(),
+            }
+            for attempt in attempts
+        ],
+    }
+
+
+def _with_attempts(deliveries: List[Delivery]) -> List[dict]:
+    by_task: Dict[str, List[DeliveryAttempt]] = {delivery.task_id: [] for delivery in deliveries}
+    if by_task:
+        for attempt in DeliveryAttempt.objects.filter(task_id__in=list(by_task)).order_by("task_id", "created_at"):
+            by_task[attempt.task_id].append(attempt)
+    return [_as_dict(delivery, by_task[delivery.task_id]) for delivery in deliveries]
+
+
+def get_delivery(task_id: str) -> Optional[dict]:
+    delivery = Delivery.objects.filter(task_id=task_id).first()
+    if delivery is None:
+        return None
+    return _with_attempts([delivery])[0]
+
+
+def deliveries_for(recipient: str, limit: int = 20) -> List[dict]:
+    """Latest deliveries to ``recipient``, newest first."""
+    deliveries = list(
+        Delivery.objects.filter(recipient=recipient).order_by("-created_at")[
+            : min(limit, RECIPIENT_LOOKUP_LIMIT)
+        ]
+    )
+    return _with_attempts(deliveries)
@@ -0,0 +1,106 @@
+import os
+import smtplib
+import socket
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .process_local import ProcessLocal
+
+# Errors meaning the socket is gone rather than the message was refused
+STALE_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+# Errors meaning the SMTP server is unreachable; a refused recipient or
+# sender is an answer, not an outage
+SMTP_OUTAGE_ERRORS = STALE_CONNECTION_ERRORS + (smtplib.SMTPConnectError, socket.gaierror)
+
+
+def _batch_size() -> int:
+    return max(1, int(os.getenv("EMAIL_BATCH_SIZE", "100")))
+
+
+def _messages_per_connection() -> int:
+    return max(1, int(os.getenv("EMAIL_MESSAGES_PER_CONNECTION", "100")))
+
+
+class PooledMailConnection:
+    """
+    Email backend kept open and authenticated across tasks in one worker
+    process. Reconnects once on a stale socket and rotates the session after
+    ``EMAIL_MESSAGES_PER_CONNECTION`` messages, since SMTP servers cap them.
+    """
+
+    def __init__(self) -> None:
+        self.backend: BaseEmailBackend = get_connection(fail_silently=False)
+        self.sent_on_connection = 0
+        self.lock = threading.RLock()
+
+    def reset(self) -> None:
+        try:
+            self.backend.close()
+        except Exception:  # noqa: BLE001 - the socket may already be dead
+            pass
+        self.sent_on_connection = 0
+
+    def deliver(self, message: EmailMessage) -> None:
+        """Send one message, raising the SMTP error if it is not accepted."""
+        for attempt in range(2):
+            try:
+                if self.sent_on_connection >= _messages_per_connection():
+                    self.reset()
+                self.backend.open()
+                # On an already-open connection send_messages() leaves it open
+                sent = self.backend.send_messages([message])
+                self.sent_on_connection += 1
+                if not sent:
+                    raise RuntimeError("Email sending failed")
+                return
+            except STALE_CONNECTION_ERRORS:
+                self.reset()
+                if attempt:
+                    raise
+
+    def send(self, message: EmailMessage) -> Optional[str]:
+        try:
+            self.deliver(message)
+            return None
+        except Exception as exc:  # noqa: BLE001 - report per recipient
+            return str(exc)
+
+
+_connections: ProcessLocal[PooledMailConnection] = ProcessLocal(PooledMailConnection)
+
+
+def get_mail_connection() -> PooledMailConnection:
+    return _connections.get()
+
+
+def send_mail_messages(messages: Sequence[EmailMessage]) -> List[Optional[str]]:
+    """
+    Send ``messages`` over the pooled connection. Returns one entry per
+    message: ``None`` on success or the error text.
+    """
+    connection = get_mail_connection()
+    with connection.lock:
+        return [connection.send(message) for message in messages]
+
+
+def send_mail_message(message: EmailMessage) -> None:
+    """Send one message over the pooled connection; SMTP errors propagate."""
+    connection = get_mail_connection()
+    with connection.lock:
+        connection.deliver(message)
+
+
+def chunked(items: Iterable, size: Optional[int] = None) -> Iterator[list]:
+    size = size or _batch_size()
+    chunk: list = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,184 @@
+import os
+from bisect import bisect_left
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from .flusher import Flusher
+from .process_local import ProcessLocal
+
+# Delivery pipeline metrics in Prometheus text format.
+#
+# Observations only touch a per-process dict; a daemon thread adds the deltas
+# to counters in the Django cache every METRICS_FLUSH_SECONDS with ``incr``
+# (atomic in Redis), so web and worker processes (and containers) sum into one
+# set of series without sharing files. Without CACHE_REDIS_URL each process
+# only exposes its own numbers.
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+
+_BUCKET_PARTS = tuple(f"bucket:{bound:g}" for bound in BUCKETS) + ("bucket:+Inf",)
+
+HISTOGRAMS = {
+    "photo_booth_stage_seconds": "Time spent in one pipeline stage",
+    "photo_booth_delivery_seconds": "Time from send_photos_task to the final delivery outcome",
+}
+COUNTERS = {
+    "photo_booth_stage_total": "Pipeline stage runs by outcome",
+    "photo_booth_deliveries_total": "Channel delivery attempts by outcome",
+}
+
+# Sums are kept as integer microseconds so they can use cache.incr
+_MICROS = 1_000_000
+
+Labels = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, Labels, str]  # (name, labels, "bucket:<le>" | "sum" | "count" | "value")
+
+
+def _flush_interval() -> float:
+    return float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+
+class _Registry:
+    def __init__(self) -> None:
+        self.pending: Dict[SeriesKey, int] = {}
+        self.lock = threading.Lock()
+        self.flusher = Flusher("Metrics", flush, _flush_interval)
+
+
+# A forked worker child drops the parent's unflushed deltas
+_registries: ProcessLocal[_Registry] = ProcessLocal(_Registry)
+
+
+def _local() -> _Registry:
+    return _registries.get()
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _add(registry: _Registry, key: SeriesKey, delta: int) -> None:
+    registry.pending[key] = registry.pending.get(key, 0) + delta
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    """Record one latency observation in histogram ``name``."""
+    registry = _local()
+    label_set = _labels(labels)
+    bucket = _BUCKET_PARTS[bisect_left(BUCKETS, seconds)]
+    with registry.lock:
+        _add(registry, (name, label_set, bucket), 1)
+        _add(registry, (name, label_set, "sum"), int(seconds * _MICROS))
+        _add(registry, (name, label_set, "count"), 1)
+    registry.flusher.start()
+
+
+def inc(name: str, amount: int = 1, **labels: str) -> None:
+    registry = _local()
+    with registry.lock:
+        _add(registry, (name, _labels(labels), "value"), amount)
+    registry.flusher.start()
+
+
+@contextmanager
+def timed(stage: str, channel: str = "") -> Iterator[None]:
+    """Time the block as ``stage`` and count it as ok or error."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        observe("photo_booth_stage_seconds", time.perf_counter() - started, stage=stage, channel=channel)
+        inc("photo_booth_stage_total", stage=stage, channel=channel, outcome=outcome)
+
+
+def _series_id(key: SeriesKey) -> str:
+    name, labels, part = key
+    label_text = ",".join(f"{k}={v}" for k, v in labels)
+    return f"{name}|{label_text}|{part}"
+
+
+def _parse_series_id(series_id: str) -> SeriesKey:
+    name, label_text, part = series_id.split("|", 2)
+    labels = tuple(tuple(item.split("=", 1)) for item in label_text.split(",") if item)
+    return name, labels, part  # type: ignore[return-value]
+
+
+def _register(series_id: str) -> None:
+    # Append-only index of every series ever flushed, so the endpoint can
+    # enumerate them without scanning cache keys
+    if cache.add(f"metrics:known:{series_id}", 1, timeout=None):
+        cache.add("metrics:series_count", 0, timeout=None)
+        index = cache.incr("metrics:series_count")
+        cache.set(f"metrics:series:{index}", series_id, timeout=None)
+
+
+def flush() -> None:
+    """Add this process's pending deltas to the shared counters."""
+    registry = _local()
+    with registry.lock:
+        pending, registry.pending = registry.pending, {}
+    for key, delta in pending.items():
+        series_id = _series_id(key)
+        value_key = f"metrics:value:{series_id}"
+        if cache.add(value_key, delta, timeout=None):
+            _register(series_id)
+            continue
+        try:
+            cache.incr(value_key, delta)
+        except ValueError:
+            # Evicted between add and incr: start the series again
+            cache.set(value_key, delta, timeout=None)
+
+
+def _snapshot() -> Dict[SeriesKey, int]:
+    count = cache.get("metrics:series_count", 0)
+    index_keys = [f"metrics:series:{index}" for index in range(1, count + 1)]
+    series_ids = list(cache.get_many(index_keys).values())
+    values = cache.get_many([f"metrics:value:{series_id}" for series_id in series_ids])
+    return {
+        _parse_series_id(key.removeprefix("metrics:value:")): value
+        for key, value in values.items()
+    }
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def render() -> str:
+    """Current metrics (after flushing this process) in Prometheus text format."""
+    flush()
+    snapshot = _snapshot()
+    lines: List[str] = []
+
+    for name, help_text in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        label_sets = sorted({labels for (metric, labels, _) in snapshot if metric == name})
+        for labels in label_sets:
+            cumulative = 0
+            for bound in [f"{bound:g}" for bound in BUCKETS] + ["+Inf"]:
+                cumulative += snapshot.get((name, labels, f"bucket:{bound}"), 0)
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            total = snapshot.get((name, labels, "sum"), 0) / _MICROS
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {snapshot.get((name, labels, 'count'), 0)}")
+
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (metric, labels, _), value in sorted(snapshot.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0003_telegramsession"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="telegramsession",
+            name="photos",
+            field=models.JSONField(
+                default=list,
+                help_text="MinIO object keys of the photos to send",
+            ),
+        ),
+    ]
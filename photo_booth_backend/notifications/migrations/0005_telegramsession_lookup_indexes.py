@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0004_telegramsession_photo_keys"),
+    ]
+
+    operations = [
+        # session_id is already unique; the composite index replaces the
+        # plain one and also covers the is_linked / expires_at filter.
+        migrations.RemoveIndex(
+            model_name="telegramsession",
+            name="notificatio_session_idx",
+        ),
+        migrations.AddIndex(
+            model_name="telegramsession",
+            index=models.Index(
+                fields=["session_id", "is_linked", "expires_at"],
+                name="tgsession_claim_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="telegramsession",
+            index=models.Index(fields=["expires_at"], name="tgsession_expires_idx"),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0005_telegramsession_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Delivery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("task_id", models.CharField(help_text="send_photos_task id", max_length=64, unique=True)),
+                ("recipient", models.CharField(max_length=255)),
+                ("preferred_method", models.CharField(max_length=20)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("queued", "Queued"), ("delivered", "Delivered"), ("failed", "Failed")],
+                        default="queued",
+                        max_length=16,
+                    ),
+                ),
+                ("channel", models.CharField(blank=True, help_text="Channel of the final attempt", max_length=20, null=True)),
+                ("photo_count", models.PositiveSmallIntegerField(default=0)),
+                ("created_at", models.DateTimeField()),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["recipient", "-created_at"], name="delivery_recipient_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryAttempt",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("task_id", models.CharField(max_length=64)),
+                ("channel", models.CharField(max_length=20)),
+                ("success", models.BooleanField()),
+                ("error", models.CharField(blank=True, max_length=255, null=True)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["task_id", "created_at"], name="delivery_attempt_task_idx"),
+                ],
+            },
+        ),
+    ]
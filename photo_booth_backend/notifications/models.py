@@ -27,7 +27,7 @@ class TelegramSession(models.Model):
     session_id = models.CharField(max_length=64, unique=True, default=uuid.uuid4)
     telegram_username = models.CharField(max_length=64, help_text="@username entered by user")
     telegram_chat_id = models.CharField(max_length=128, blank=True, null=True, help_text="Captured when user starts bot")
-    photos = models.JSONField(default=list, help_text="Photos to send (data URLs or presigned URLs)")
+    photos = models.JSONField(default=list, help_text="MinIO object keys of the photos to send")
     preferred_method = models.CharField(max_length=20, default="telegram")
     notification_phone = models.CharField(max_length=20, blank=True, null=True)
 
@@ -45,6 +45,63 @@ class TelegramSession(models.Model):
     class Meta:
         ordering = ["-created_at"]
         indexes = [
-            models.Index(fields=["session_id"]),
-            models.Index(fields=["telegram_username"]),
+            # Webhook claim: session_id = ? AND is_linked = false AND expires_at > now
+            models.Index(
+                fields=["session_id", "is_linked", "expires_at"],
+                name="tgsession_claim_idx",
+            ),
+            # Purge: expires_at < cutoff
+            models.Index(fields=["expires_at"], name="tgsession_expires_idx"),
+            models.Index(fields=["telegram_username"], name="notificatio_telegra_idx"),
+        ]
+
+
+class Delivery(models.Model):
+    """One photo delivery, keyed by the id of its send_photos_task"""
+    STATUS_QUEUED = "queued"
+    STATUS_DELIVERED = "delivered"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_DELIVERED, "Delivered"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    task_id = models.CharField(max_length=64, unique=True, help_text="send_photos_task id")
+    recipient = models.CharField(max_length=255)
+    preferred_method = models.CharField(max_length=20)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    channel = models.CharField(max_length=20, blank=True, null=True, help_text="Channel of the final attempt")
+    photo_count = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f"{self.recipient} - {self.task_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Status lookup by recipient, newest first
+            models.Index(fields=["recipient", "-created_at"], name="delivery_recipient_idx"),
+        ]
+
+
+class DeliveryAttempt(models.Model):
+    """
+    One channel attempt of a Delivery. Linked by task_id rather than a
+    foreign key: attempts and their delivery are written by different worker
+    processes and may reach the database in either order.
+    """
+    task_id = models.CharField(max_length=64)
+    channel = models.CharField(max_length=20)
+    success = models.BooleanField()
+    error = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.task_id} {self.channel} {'ok' if self.success else 'failed'}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task_id", "created_at"], name="delivery_attempt_task_idx"),
         ]
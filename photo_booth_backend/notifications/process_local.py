@@ -0,0 +1,37 @@
+import os
+import threading
+from typing import Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class ProcessLocal(Generic[T]):
+    """
+    Values built lazily, once per OS process and key.
+
+    Sockets, pools, threads and buffers must not cross a fork: prefork Celery
+    and gunicorn workers start from a copy of the parent, including its
+    connections and any half-held lock. A forked child therefore starts from
+    an empty table (and a fresh lock) and builds its own values on first use.
+    """
+
+    def __init__(self, factory: Callable[..., T]) -> None:
+        self._factory = factory
+        self._values: Dict[Tuple[Hashable, ...], T] = {}
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, *key: Hashable) -> T:
+        """The value for ``key``, calling ``factory(*key)`` the first time."""
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._factory(*key)
+            return self._values[key]
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from .http_clients import remaining_budget
+from .process_local import ProcessLocal
+
+# Provider ceilings: Telegram allows ~30 messages/s per bot and ~1/s per chat,
+# Twilio queues 1 message/s per sender number (higher for messaging services).
+# Each entry is (rate per second env, default, burst env, default).
+BUCKET_LIMITS: Dict[str, Tuple[str, str, str, str]] = {
+    "telegram": ("TELEGRAM_RATE_PER_SECOND", "30", "TELEGRAM_RATE_BURST", "30"),
+    "telegram_chat": ("TELEGRAM_CHAT_RATE_PER_SECOND", "1", "TELEGRAM_CHAT_RATE_BURST", "1"),
+    "twilio": ("TWILIO_RATE_PER_SECOND", "1", "TWILIO_RATE_BURST", "1"),
+}
+
+
+class RateLimited(RuntimeError):
+    """The bucket stays empty for longer than the caller is willing to wait."""
+
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"rate limited on {bucket}, retry after {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+def _limits(kind: str) -> Tuple[float, int]:
+    rate_env, rate_default, burst_env, burst_default = BUCKET_LIMITS[kind]
+    return float(os.getenv(rate_env, rate_default)), int(os.getenv(burst_env, burst_default))
+
+
+# GCRA (the token bucket expressed as one "theoretical arrival time" per key).
+# Reserving a slot moves TAT forward by one emission interval; a slot is free
+# once TAT - burst tolerance has passed. Times are microseconds on the Redis
+# clock, so workers on different hosts agree, and TAT is written with %.0f
+# because Lua's default number format would round it. Returns the wait; the
+# slot is only reserved when that wait is within max_wait. penalty > 0
+# instead pushes TAT so nothing passes before now + penalty.
+_GCRA_SCRIPT = """
+local function store(tat, now)
+  redis.call('SET', KEYS[1], string.format('%.0f', tat), 'PX', math.ceil((tat - now) / 1000) + 1000)
+end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local penalty = tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+if penalty > 0 then
+  tat = math.max(tat, now + penalty + tolerance)
+  store(tat, now)
+  return 0
+end
+local wait = math.max(0, tat - tolerance - now)
+if wait <= max_wait then
+  tat = tat + interval
+  store(tat, now)
+end
+return wait
+"""
+
+
+def _register_script(url: str):
+    import redis
+
+    return redis.Redis.from_url(url).register_script(_GCRA_SCRIPT)
+
+
+_redis_scripts: ProcessLocal[object] = ProcessLocal(_register_script)
+_local_tats: Dict[str, float] = {}
+_local_lock = threading.Lock()
+
+
+def _redis_script():
+    """Per-process Lua script handle, or None without CACHE_REDIS_URL."""
+    url = os.getenv("CACHE_REDIS_URL")
+    if not url:
+        return None
+    return _redis_scripts.get(url)
+
+
+def _local_gcra(key: str, interval: float, tolerance: float, max_wait: float, penalty: float) -> float:
+    # Same algorithm for a single process (dev setups without Redis)
+    with _local_lock:
+        now = time.monotonic()
+        tat = max(_local_tats.get(key, now), now)
+        if penalty > 0:
+            _local_tats[key] = max(tat, now + penalty + tolerance)
+            return 0.0
+        wait = max(0.0, tat - tolerance - now)
+        if wait <= max_wait:
+            _local_tats[key] = tat + interval
+        return wait
+
+
+def _gcra(kind: str, key: str, max_wait: float, penalty: float = 0.0) -> float:
+    rate, burst = _limits(kind)
+    interval = 1.0 / rate
+    tolerance = interval * (burst - 1)
+    script = _redis_script()
+    if script is None:
+        return _local_gcra(key, interval, tolerance, max_wait, penalty)
+    wait_us = script(
+        keys=[key],
+        args=[
+            int(interval * 1_000_000),
+            int(tolerance * 1_000_000),
+            int(max_wait * 1_000_000),
+            int(penalty * 1_000_000),
+        ],
+    )
+    return int(wait_us) / 1_000_000
+
+
+def _bucket_key(kind: str, scope: str = "") -> str:
+    return f"ratelimit:{kind}:{scope}" if scope else f"ratelimit:{kind}"
+
+
+def _max_wait() -> float:
+    max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+    remaining = remaining_budget()
+    return max_wait if remaining is None else max(0.0, min(max_wait, remaining))
+
+
+def acquire(kind: str, scope: str = "") -> None:
+    """
+    Take one token from the ``kind`` bucket (``scope`` = chat id for per-chat
+    buckets), sleeping until it is due. Raises RateLimited when the wait would
+    exceed ``RATE_LIMIT_MAX_WAIT`` or the delivery deadline, so the caller can
+    reschedule instead of holding a worker.
+    """
+    key = _bucket_key(kind, scope)
+    max_wait = _max_wait()
+    wait = _gcra(kind, key, max_wait)
+    if wait > max_wait:
+        raise RateLimited(key, wait)
+    if wait > 0:
+        time.sleep(wait)
+
+
+def penalize(kind: str, scope: str, retry_after: float) -> None:
+    """Close the bucket for ``retry_after`` seconds after the provider said 429."""
+    _gcra(kind, _bucket_key(kind, scope), 0.0, penalty=retry_after)
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """
+    Back-off requested by a 429: Telegram's ``parameters.retry_after`` or the
+    ``Retry-After`` header (Twilio). None when the response is not a 429.
+    """
+    if response.status_code != 429:
+        return None
+    try:
+        retry_after = response.json().get("parameters", {}).get("retry_after")
+    except ValueError:
+        retry_after = None
+    if retry_after is None:
+        retry_after = response.headers.get("Retry-After")
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return float(os.getenv("RATE_LIMIT_DEFAULT_BACKOFF", "1"))
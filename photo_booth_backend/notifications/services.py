@@ -1,14 +1,37 @@
-from dataclasses import dataclass
-from typing import List, Literal, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+import hashlib
+import json
 import os
 import random
 import time
 import requests
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMessage
 
+from .breakers import get_breaker
+from .http_clients import DeadlineExceeded, deadline_scope, get_session, provider_timeout
+from .images import render_variants
+from .mail import SMTP_OUTAGE_ERRORS, send_mail_message
+from .metrics import inc, observe, timed
+from .ratelimit import RateLimited, acquire, penalize, retry_after_seconds
+from .storage import read_photo, to_internal_url
+
 DeliveryMethod = Literal["email", "sms", "telegram"]
 
+# Failures that say the provider itself is down and count toward its
+# circuit breaker; see _is_provider_outage
+PROVIDER_OUTAGE_ERRORS = (requests.ConnectionError, requests.Timeout) + SMTP_OUTAGE_ERRORS
+
+
+class ProviderError(RuntimeError):
+    """An HTTP provider answered with an error status."""
+
+    def __init__(self, provider: str, response: requests.Response):
+        super().__init__(f"{provider} API error {response.status_code}: {response.text}")
+        self.status = response.status_code
+
 
 @dataclass
 class ChannelResult:
@@ -16,25 +39,117 @@ class ChannelResult:
     success: bool
     detail: str
     error: str | None = None
+    retry_after: float | None = None  # set when the provider's rate limit was hit
+    skipped: bool = False  # not attempted: the channel's circuit breaker is open
+
+
+class PhotoBlobCache:
+    """
+    Per-task store of photo bytes shared by every channel attempt.
+
+    Photos are read once (by MinIO object key when known, otherwise over
+    HTTP) and kept in memory up to ``PHOTO_BLOB_CACHE_BYTES`` in total, so a
+    fallback from email to Telegram does not download everything again.
+    """
+
+    def __init__(self, urls: List[str], keys: Optional[List[str]] = None, max_bytes: Optional[int] = None):
+        self.urls = urls
+        self.keys = keys
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("PHOTO_BLOB_CACHE_BYTES", str(64 * 1024 * 1024))
+        )
+        self._blobs: Dict[int, Tuple[bytes, str]] = {}
+        self._size = 0
+
+    def put(self, idx: int, content: bytes, content_type: str = "image/jpeg") -> None:
+        if idx in self._blobs or self._size + len(content) > self.max_bytes:
+            return
+        self._blobs[idx] = (content, content_type)
+        self._size += len(content)
+
+    def get(self, idx: int) -> Tuple[bytes, str]:
+        cached = self._blobs.get(idx)
+        if cached is not None:
+            return cached
+        if self.keys is not None:
+            content, content_type = read_photo(self.keys[idx])
+        else:
+            with timed("photo_fetch"):
+                response = get_session("minio").get(
+                    to_internal_url(self.urls[idx]), timeout=provider_timeout("minio")
+                )
+                response.raise_for_status()
+            content = response.content
+            content_type = response.headers.get("Content-Type", "image/jpeg")
+        self.put(idx, content, content_type)
+        return content, content_type
+
+    def variants(self, indexes: Sequence[int], variant: str) -> List[bytes]:
+        """Channel renditions of the given photos (see images.render_variants)."""
+        contents = [self.get(idx)[0] for idx in indexes]
+        with timed("render", variant):
+            return render_variants(contents, variant)
 
 
 @dataclass
-class SendOutcome:
-    success: bool
-    attempts: List[ChannelResult]
+class SendPayload:
+    recipient: str
+    photos: List[str]  # public presigned URLs
+    blobs: PhotoBlobCache = field(init=False)
+    photo_keys: Optional[List[str]] = None
 
+    def __post_init__(self) -> None:
+        self.blobs = PhotoBlobCache(self.photos, self.photo_keys)
 
-SendPayload = Tuple[str, List[str]]  # recipient, photos
 
 CHANNEL_PRIORITY: List[DeliveryMethod] = ["email", "sms", "telegram"]
 
+TELEGRAM_ALBUM_SIZE = 10  # sendMediaGroup limit
+
+
+def _provider_post(
+    provider: str, timeout_name: str, url: str, buckets: List[Tuple[str, str]], **kwargs
+) -> requests.Response:
+    """
+    POST through the pooled session once every ``(kind, scope)`` rate bucket
+    has a token. A 429 closes the most specific bucket for the provider's
+    ``retry_after`` and the call is retried once it reopens.
+    """
+    for _ in range(2):
+        with timed("rate_limit_wait", provider):
+            for kind, scope in buckets:
+                acquire(kind, scope)
+        with timed(timeout_name, provider):
+            response = get_session(provider).post(
+                url, timeout=provider_timeout(timeout_name), **kwargs
+            )
+        retry_after = retry_after_seconds(response)
+        if retry_after is None:
+            break
+        kind, scope = buckets[-1]
+        penalize(kind, scope, retry_after)
+    return response
+
+
+def _telegram_api_base() -> str:
+    # Overridable for a self-hosted Bot API server or local stubs
+    return os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+
+def _twilio_api_base() -> str:
+    return os.getenv("TWILIO_API_BASE", "https://api.twilio.com").rstrip("/")
+
+
+def _telegram_buckets(chat_id: str) -> List[Tuple[str, str]]:
+    return [("telegram", ""), ("telegram_chat", str(chat_id))]
+
 
 def _simulate_provider_latency(min_ms: int = 150, max_ms: int = 400) -> None:
     time.sleep(random.uniform(min_ms, max_ms) / 1000)
 
 
 def _send_email(payload: SendPayload) -> str:
-    recipient, photos = payload
+    recipient, photos = payload.recipient, payload.photos
     subject = "Your AI Photo Booth photos"
     body = "Thanks for using AI Photo Booth! Your photos are attached."
 
@@ -49,24 +164,26 @@ def _send_email(payload: SendPayload) -> str:
         to=[recipient],
     )
 
-    for idx, url in enumerate(photos):
+    fetched: Dict[int, bytes] = {}
+    for idx in range(len(photos)):
         try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            content = resp.content
-            if len(content) > max_bytes:
-                raise RuntimeError("attachment too large")
-            content_type = resp.headers.get("Content-Type", "image/jpeg")
-            filename = f"photo_{idx + 1}.jpg"
-            email.attach(filename, content, content_type)
-            attachments_added += 1
+            fetched[idx] = payload.blobs.get(idx)[0]
         except Exception:
             # If an attachment fails, continue with links in the body
             continue
 
-    sent = email.send(fail_silently=False)
-    if sent == 0:
-        raise RuntimeError("Email sending failed")
+    with timed("render", "email"):
+        rendered = render_variants(list(fetched.values()), "email")
+    for idx, content in zip(fetched, rendered):
+        if len(content) > max_bytes:
+            content = render_variants([fetched[idx]], "email_reduced")[0]
+        if len(content) > max_bytes:
+            continue
+        email.attach(f"photo_{idx + 1}.jpg", content, "image/jpeg")
+        attachments_added += 1
+
+    with timed("smtp_send", "email"):
+        send_mail_message(email)
     return f"Sent {len(photos)} photo(s) to {recipient} via email (attachments: {attachments_added})"
 
 
@@ -91,22 +208,22 @@ def _twilio_send_message(recipient: str, body: str) -> str:
     else:
         data["From"] = from_number
 
-    response = requests.post(
-        f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json",
+    response = _provider_post(
+        "twilio",
+        "twilio",
+        f"{_twilio_api_base()}/2010-04-01/Accounts/{account_sid}/Messages.json",
+        [("twilio", "")],
         data=data,
         auth=(account_sid, auth_token),
-        timeout=10,
     )
     if response.status_code >= 400:
-        raise RuntimeError(
-            f"Twilio API error {response.status_code}: {response.text}"
-        )
+        raise ProviderError("Twilio", response)
 
     return response.json().get("sid", "")
 
 
 def _send_sms(payload: SendPayload) -> str:
-    recipient, photos = payload
+    recipient, photos = payload.recipient, payload.photos
     link = photos[0] if photos else ""
     extra = len(photos) - 1
     summary = f"Your AI Photo Booth photo{'s' if len(photos) != 1 else ''}"
@@ -123,11 +240,13 @@ def _send_telegram_message(chat_id: str, text: str) -> None:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
 
     # Telegram accepts chat_id as numeric ID or @username once the user started the bot.
-    api_url = f"https://api.telegram.org/bot{token}/sendMessage"
+    api_url = f"{_telegram_api_base()}/bot{token}/sendMessage"
 
-    response = requests.post(
+    response = _provider_post(
+        "telegram",
+        "telegram",
         api_url,
-        timeout=10,
+        _telegram_buckets(chat_id),
         json={
             "chat_id": chat_id,
             "text": text,
@@ -135,68 +254,165 @@ def _send_telegram_message(chat_id: str, text: str) -> None:
         },
     )
     if response.status_code != 200:
-        raise RuntimeError(
-            f"Telegram API error {response.status_code}: {response.text}"
+        raise ProviderError("Telegram", response)
+
+
+def _telegram_file_id_key(photo_content: bytes) -> str:
+    return f"telegram:file_id:{hashlib.sha256(photo_content).hexdigest()}"
+
+
+def _remember_telegram_file_id(photo_content: bytes, message: dict) -> None:
+    sizes = message.get("photo") or []
+    if sizes:
+        # Largest size is last; reusing its file_id sends the original photo
+        cache.set(
+            _telegram_file_id_key(photo_content),
+            sizes[-1]["file_id"],
+            timeout=int(os.getenv("TELEGRAM_FILE_ID_TTL", str(7 * 24 * 3600))),
         )
 
-def _send_telegram_photo(chat_id: str, photo_url: str, caption: str = "") -> None:
-    """Send a photo to Telegram by downloading and uploading it"""
+
+def _send_telegram_photo(
+    chat_id: str, photo_url: str, caption: str = "", photo_content: bytes | None = None
+) -> None:
+    """
+    Send a photo to Telegram, uploading ``photo_content`` or downloading it first.
+    Photos Telegram has already seen are sent by cached ``file_id`` instead.
+    """
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
 
-    # Replace public endpoint with internal Docker endpoint for downloading
-    # This allows the worker to access MinIO from inside Docker network
-    public_endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
-    internal_endpoint = os.getenv("MINIO_ENDPOINT", "minio:9000")
-    internal_url = photo_url.replace(f"http://{public_endpoint}", f"http://{internal_endpoint}")
-    internal_url = internal_url.replace(f"https://{public_endpoint}", f"http://{internal_endpoint}")
+    if photo_content is None:
+        # Download from MinIO via the internal Docker endpoint
+        photo_response = get_session("minio").get(
+            to_internal_url(photo_url), timeout=provider_timeout("minio")
+        )
+        photo_response.raise_for_status()
+        photo_content = photo_response.content
 
-    # Download the photo from MinIO using internal URL
-    photo_response = requests.get(internal_url, timeout=10)
-    photo_response.raise_for_status()
-    photo_content = photo_response.content
+    api_url = f"{_telegram_api_base()}/bot{token}/sendPhoto"
+    data = {
+        "chat_id": chat_id,
+        "caption": caption,
+    }
 
-    api_url = f"https://api.telegram.org/bot{token}/sendPhoto"
+    file_id_key = _telegram_file_id_key(photo_content)
+    file_id = cache.get(file_id_key)
+    if file_id:
+        response = _provider_post(
+            "telegram", "telegram", api_url, _telegram_buckets(chat_id),
+            data={**data, "photo": file_id},
+        )
+        if response.status_code == 200:
+            return
+        # Stale or foreign file_id: forget it and upload the bytes
+        cache.delete(file_id_key)
 
     # Upload the photo as multipart/form-data
     files = {
         "photo": ("photo.jpg", photo_content, "image/jpeg")
     }
-    data = {
-        "chat_id": chat_id,
-        "caption": caption,
-    }
 
-    response = requests.post(
+    response = _provider_post(
+        "telegram",
+        "telegram_upload",
         api_url,
-        timeout=30,
+        _telegram_buckets(chat_id),
         files=files,
         data=data,
     )
     if response.status_code != 200:
-        raise RuntimeError(
-            f"Telegram API error {response.status_code}: {response.text}"
-        )
+        raise ProviderError("Telegram", response)
+    _remember_telegram_file_id(photo_content, response.json().get("result", {}))
 
 
-def _send_telegram(payload: SendPayload) -> str:
-    recipient, photos = payload
+def _send_telegram_media_group(chat_id: str, photo_contents: List[bytes], caption: str = "") -> None:
+    """
+    Send 2-10 photos as one album; the caption is shown on the first item.
+    Photos with a cached ``file_id`` are referenced instead of uploaded.
+    """
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
 
-    # Send intro message
-    intro = f"📸 Your AI Photo Booth photos ({len(photos)} photo{'s' if len(photos) != 1 else ''}):"
-    _send_telegram_message(recipient, intro)
+    api_url = f"{_telegram_api_base()}/bot{token}/sendMediaGroup"
+
+    file_id_keys = [_telegram_file_id_key(content) for content in photo_contents]
+    file_ids = cache.get_many(file_id_keys)
+
+    media = []
+    files = {}
+    for idx, content in enumerate(photo_contents):
+        file_id = file_ids.get(file_id_keys[idx])
+        if file_id:
+            item = {"type": "photo", "media": file_id}
+        else:
+            item = {"type": "photo", "media": f"attach://photo{idx}"}
+            files[f"photo{idx}"] = (f"photo_{idx + 1}.jpg", content, "image/jpeg")
+        if idx == 0 and caption:
+            item["caption"] = caption
+        media.append(item)
+
+    response = _provider_post(
+        "telegram",
+        "telegram_upload",
+        api_url,
+        _telegram_buckets(chat_id),
+        files=files or None,
+        data={"chat_id": chat_id, "media": json.dumps(media)},
+    )
+    if response.status_code != 200:
+        if file_ids:
+            cache.delete_many(list(file_ids))
+        raise ProviderError("Telegram", response)
 
-    # Send each photo as actual image
-    for idx, photo_url in enumerate(photos):
+    for content, message in zip(photo_contents, response.json().get("result", [])):
+        _remember_telegram_file_id(content, message)
+
+
+def _send_telegram_photos_one_by_one(payload: SendPayload, indexes: range) -> None:
+    recipient, photos = payload.recipient, payload.photos
+    for idx in indexes:
+        photo_url = photos[idx]
         try:
             caption = f"Photo {idx + 1} of {len(photos)}"
-            _send_telegram_photo(recipient, photo_url, caption)
+            content = payload.blobs.variants([idx], "telegram")[0]
+            _send_telegram_photo(recipient, photo_url, caption, photo_content=content)
+        except RateLimited:
+            raise
         except Exception as e:
             # If photo send fails, try sending as link
             _send_telegram_message(recipient, f"Photo {idx + 1}: {photo_url}")
             raise RuntimeError(f"Failed to send photo {idx + 1}: {str(e)}")
 
+
+def _send_telegram(payload: SendPayload) -> str:
+    recipient, photos = payload.recipient, payload.photos
+
+    intro = f"📸 Your AI Photo Booth photos ({len(photos)} photo{'s' if len(photos) != 1 else ''}):"
+    if not photos:
+        _send_telegram_message(recipient, intro)
+
+    # Send photos as albums (one Bot API call per up to 10 photos);
+    # fall back to per-photo uploads only for an album that fails.
+    for start in range(0, len(photos), TELEGRAM_ALBUM_SIZE):
+        indexes = range(start, min(start + TELEGRAM_ALBUM_SIZE, len(photos)))
+        caption = intro if start == 0 else ""
+        try:
+            contents = payload.blobs.variants(indexes, "telegram")
+            if len(contents) == 1:
+                # sendMediaGroup needs at least two items
+                _send_telegram_photo(recipient, photos[start], caption, photo_content=contents[0])
+            else:
+                _send_telegram_media_group(recipient, contents, caption)
+        except RateLimited:
+            raise
+        except Exception:
+            if start == 0:
+                _send_telegram_message(recipient, intro)
+            _send_telegram_photos_one_by_one(payload, indexes)
+
     username = recipient.removeprefix("@")
     return f"Delivered {len(photos)} photo(s) to @{username or recipient} on Telegram"
 
@@ -223,38 +439,111 @@ def _should_fail(channel: DeliveryMethod) -> bool:
     return random.random() < fail_rate[channel]
 
 
-def send_photos_with_fallback(
-    recipient: str, photos: List[str], preferred: DeliveryMethod
-) -> SendOutcome:
+def fallback_order(preferred: DeliveryMethod) -> List[DeliveryMethod]:
+    return [preferred] + [channel for channel in CHANNEL_PRIORITY if channel != preferred]
+
+
+def delivery_deadline(started: Optional[float] = None) -> float:
+    """Absolute deadline for a delivery hop that starts at ``started`` (default now)."""
+    if started is None:
+        started = time.time()
+    return started + float(os.getenv("DELIVERY_DEADLINE_SECONDS", "120"))
+
+
+def _outcome(result: ChannelResult) -> str:
+    if result.success:
+        return "success"
+    if result.retry_after is not None:
+        return "rate_limited"
+    if result.skipped:
+        return "skipped"
+    return "failure"
+
+
+def send_via_channel(
+    channel: DeliveryMethod, payload: SendPayload, deadline: Optional[float] = None
+) -> ChannelResult:
     """
-    Try the preferred channel first, then fall back through the rest.
+    Attempt delivery over a single channel, capturing any provider failure.
+
+    A channel whose circuit breaker is open is skipped without a request, and
+    provider timeouts are capped by what is left of ``deadline``.
     """
-    order: List[DeliveryMethod] = [preferred] + [
-        channel for channel in CHANNEL_PRIORITY if channel != preferred
-    ]
+    started = time.perf_counter()
+    result = _attempt_channel(channel, payload, deadline)
+    observe(
+        "photo_booth_stage_seconds", time.perf_counter() - started, stage="channel", channel=channel
+    )
+    inc("photo_booth_deliveries_total", channel=channel, outcome=_outcome(result))
+    return result
+
+
+def _attempt_channel(
+    channel: DeliveryMethod, payload: SendPayload, deadline: Optional[float]
+) -> ChannelResult:
+    breaker = get_breaker(channel)
+    if not breaker.allow():
+        return ChannelResult(
+            channel=channel,
+            success=False,
+            detail=f"Skipped {channel}",
+            error="circuit open",
+            skipped=True,
+        )
 
-    attempts: List[ChannelResult] = []
+    sender = CHANNEL_SENDERS[channel]
+    try:
+        if _should_fail(channel):
+            raise ConnectionError(f"{channel} provider unavailable")
+
+        with deadline_scope(deadline):
+            detail = sender(payload)
+        breaker.record_success()
+        return ChannelResult(channel=channel, success=True, detail=detail)
+    except RateLimited as exc:
+        # Throttling is not a provider failure: keep the breaker closed and
+        # let the caller retry this channel once the bucket refills
+        return ChannelResult(
+            channel=channel,
+            success=False,
+            detail=f"Rate limited on {channel}",
+            error=str(exc),
+            retry_after=exc.retry_after,
+        )
+    except DeadlineExceeded as exc:
+        # Running out of budget says nothing about the provider's health
+        return ChannelResult(
+            channel=channel,
+            success=False,
+            detail=f"Failed to send via {channel}",
+            error=str(exc),
+        )
+    except Exception as exc:  # noqa: BLE001 - we want to capture any provider failure
+        if _is_provider_outage(exc):
+            breaker.record_failure()
+        return ChannelResult(
+            channel=channel,
+            success=False,
+            detail=f"Failed to send via {channel}",
+            error=str(exc),
+        )
 
-    for channel in order:
-        sender = CHANNEL_SENDERS[channel]
-        try:
-            if _should_fail(channel):
-                raise RuntimeError(f"{channel} provider unavailable")
-
-            detail = sender((recipient, photos))
-            attempts.append(ChannelResult(channel=channel, success=True, detail=detail))
-            return SendOutcome(success=True, attempts=attempts)
-        except Exception as exc:  # noqa: BLE001 - we want to capture any provider failure
-            attempts.append(
-                ChannelResult(
-                    channel=channel,
-                    success=False,
-                    detail=f"Failed to send via {channel}",
-                    error=str(exc),
-                )
-            )
 
-    return SendOutcome(success=False, attempts=attempts)
+def _is_provider_outage(exc: BaseException) -> bool:
+    """
+    Whether a failed attempt means the provider is down: a transport error,
+    a timeout or a 5xx answer, here or anywhere in the exception chain. A
+    refused message (Telegram 400 "chat not found", an SMTP recipient
+    refused) is a plain failed attempt and leaves the breaker alone.
+    """
+    error: Optional[BaseException] = exc
+    while error is not None:
+        if isinstance(error, ProviderError):
+            return error.status >= 500
+        if isinstance(error, PROVIDER_OUTAGE_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
 
 
 def send_status_sms(phone: str, message: str) -> str:
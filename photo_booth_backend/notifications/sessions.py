@@ -0,0 +1,100 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import TelegramSession
+
+
+def _state_ttl() -> int:
+    # A per-process local-memory cache cannot see the worker's updates, so
+    # cached state must expire quickly unless the cache is shared (Redis).
+    default = "900" if os.getenv("CACHE_REDIS_URL") else "5"
+    return int(os.getenv("TELEGRAM_SESSION_STATE_TTL", default))
+
+
+def _key(session_id: str) -> str:
+    return f"telegram_session:{session_id}"
+
+
+def cache_session_state(
+    session_id: str,
+    expires_at: datetime,
+    is_linked: bool = False,
+    is_sent: bool = False,
+    task_id: Optional[str] = None,
+) -> dict:
+    state = {
+        "is_linked": is_linked,
+        "is_sent": is_sent,
+        "task_id": task_id,
+        "expires_at": expires_at.timestamp(),
+    }
+    cache.set(_key(session_id), state, timeout=_state_ttl())
+    return state
+
+
+def update_session_state(session_id: str, **changes) -> None:
+    """Apply ``changes`` to the cached state; drop it if it is not cached."""
+    state = cache.get(_key(session_id))
+    if state is None:
+        return
+    state.update(changes)
+    cache.set(_key(session_id), state, timeout=_state_ttl())
+
+
+def get_session_state(session_id: str, load: bool = True) -> Optional[dict]:
+    """
+    Session status from the cache, loading it from the database on a miss
+    (unless ``load`` is False). Returns None for unknown sessions.
+    """
+    state = cache.get(_key(session_id))
+    if state is not None or not load:
+        return state
+    try:
+        session = TelegramSession.objects.only(
+            "is_linked", "is_sent", "task_id", "expires_at"
+        ).get(session_id=session_id)
+    except TelegramSession.DoesNotExist:
+        return None
+    return cache_session_state(
+        session_id,
+        session.expires_at,
+        is_linked=session.is_linked,
+        is_sent=session.is_sent,
+        task_id=session.task_id,
+    )
+
+
+def is_expired(state: dict) -> bool:
+    return state["expires_at"] < timezone.now().timestamp()
+
+
+def purge_expired_sessions(
+    batch_size: Optional[int] = None, max_batches: Optional[int] = None
+) -> tuple[int, bool]:
+    """
+    Delete sessions that expired more than ``TELEGRAM_SESSION_RETENTION_SECONDS``
+    ago, ``batch_size`` rows per DELETE so no statement holds the table for
+    long. Returns (rows deleted, whether expired rows remain). Runs on the
+    beat-driven worker, so it only reaches the sessions web created when both
+    use the same database (PostgreSQL under compose).
+    """
+    batch_size = batch_size or int(os.getenv("TELEGRAM_SESSION_PURGE_BATCH", "1000"))
+    max_batches = max_batches or int(os.getenv("TELEGRAM_SESSION_PURGE_MAX_BATCHES", "50"))
+    retention = int(os.getenv("TELEGRAM_SESSION_RETENTION_SECONDS", "3600"))
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    expired = TelegramSession.objects.filter(expires_at__lt=cutoff).order_by()
+
+    deleted = 0
+    for _ in range(max_batches):
+        ids = list(expired.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted, False
+        # No relations point at TelegramSession, so this is a single DELETE
+        deleted += TelegramSession.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return deleted, False
+    return deleted, True
@@ -1,26 +1,116 @@
 import base64
+import hashlib
 import io
 import os
+import re
+import threading
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from typing import List
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Set, Tuple, TypeVar
 
 import requests
 from minio import Minio
 from minio.error import S3Error
+from urllib3.exceptions import HTTPError as Urllib3Error
 
+from .http_clients import get_session, provider_timeout
+from .metrics import timed
+from .process_local import ProcessLocal
 
-def get_minio_client() -> Minio:
-    endpoint = os.getenv("MINIO_ENDPOINT", "minio:9000")
+
+T = TypeVar("T")
+
+_known_buckets: Set[str] = set()
+
+
+def _minio_credentials() -> Tuple[str, str]:
     access_key = os.getenv("MINIO_ACCESS_KEY", os.getenv("MINIO_ROOT_USER", "minioadmin"))
     secret_key = os.getenv("MINIO_SECRET_KEY", os.getenv("MINIO_ROOT_PASSWORD", "minioadmin"))
+    return access_key, secret_key
+
+
+def _new_client(endpoint: str, secure: bool) -> Minio:
+    access_key, secret_key = _minio_credentials()
+    return Minio(
+        endpoint,
+        access_key=access_key,
+        secret_key=secret_key,
+        secure=secure,
+        # Pinning the region skips the GetBucketLocation round trip.
+        region=os.getenv("MINIO_REGION", "us-east-1"),
+    )
+
+
+_clients: ProcessLocal[Minio] = ProcessLocal(_new_client)
+
+
+def get_minio_client() -> Minio:
+    """Process-wide client for the internal MinIO endpoint."""
+    endpoint = os.getenv("MINIO_ENDPOINT", "minio:9000")
     use_ssl = os.getenv("MINIO_USE_SSL", "false").lower() == "true"
-    return Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=use_ssl)
+    return _clients.get(endpoint, use_ssl)
+
+
+def get_public_signer() -> Minio:
+    """
+    Client bound to the public endpoint, used only for presigning.
+
+    Presigned URLs sign the Host header, so they must be generated for the
+    host the browser will use. With a pinned region this is pure computation.
+    """
+    endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
+    use_ssl = os.getenv(
+        "MINIO_PUBLIC_USE_SSL", os.getenv("MINIO_USE_SSL", "false")
+    ).lower() == "true"
+    return _clients.get(endpoint, use_ssl)
 
 
 def ensure_bucket(client: Minio, bucket: str) -> None:
+    if bucket in _known_buckets:
+        return
     if not client.bucket_exists(bucket):
         client.make_bucket(bucket)
+    _known_buckets.add(bucket)
+
+
+def presign_put(bucket: str, object_name: str, expires: timedelta = timedelta(minutes=15)) -> str:
+    return get_public_signer().get_presigned_url(
+        "PUT",
+        bucket_name=bucket,
+        object_name=object_name,
+        expires=expires,
+    )
+
+
+def presign_get(bucket: str, object_name: str, expires: timedelta = timedelta(hours=24)) -> str:
+    return get_public_signer().get_presigned_url(
+        "GET",
+        bucket_name=bucket,
+        object_name=object_name,
+        expires=expires,
+    )
+
+
+def read_photo(object_name: str) -> Tuple[bytes, str]:
+    """Fetch a stored photo through the internal endpoint; returns (content, content_type)."""
+    bucket = os.getenv("MINIO_BUCKET", "photobooth")
+    with timed("read_photo"):
+        response = get_minio_client().get_object(bucket, object_name)
+        try:
+            return response.read(), response.headers.get("Content-Type", "image/jpeg")
+        finally:
+            response.close()
+            response.release_conn()
+
+
+def to_internal_url(url: str) -> str:
+    """Rewrite a public presigned URL so it is reachable from inside the Docker network."""
+    public_endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
+    internal_endpoint = os.getenv("MINIO_ENDPOINT", "minio:9000")
+    url = url.replace(f"http://{public_endpoint}", f"http://{internal_endpoint}")
+    return url.replace(f"https://{public_endpoint}", f"http://{internal_endpoint}")
 
 
 def _decode_data_url(data_url: str) -> bytes:
@@ -28,60 +118,209 @@ def _decode_data_url(data_url: str) -> bytes:
     if ";base64," not in data_url:
         raise ValueError("Invalid data URL")
     encoded = data_url.split(";base64,", 1)[1]
-    return base64.b64decode(encoded)
+    with timed("decode"):
+        return base64.b64decode(encoded)
 
 
 def _fetch_binary(url: str) -> bytes:
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    return resp.content
+    with timed("fetch_source"):
+        resp = get_session("minio").get(url, timeout=provider_timeout("minio"))
+        resp.raise_for_status()
+        return resp.content
+
+
+class PhotoUploadError(RuntimeError):
+    """Raised when one or more photos fail to upload; ``errors`` maps input index to message."""
+
+    def __init__(self, errors: Dict[int, str]):
+        self.errors = errors
+        summary = "; ".join(f"photo {idx + 1}: {msg}" for idx, msg in sorted(errors.items()))
+        super().__init__(f"Failed to upload photo: {summary}")
+
+
+# What a failed MinIO call or photo source can raise: the MinIO client
+# surfaces transport failures (MinIO unreachable) as urllib3 errors
+STORAGE_ERRORS = (S3Error, Urllib3Error, requests.RequestException, ValueError, OSError)
+
+
+def _upload_concurrency() -> int:
+    return max(1, int(os.getenv("MINIO_UPLOAD_CONCURRENCY", "4")))
+
+
+PHOTO_KEY_RE = re.compile(r"^photos/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.jpg$")
+MAX_UPLOAD_URLS = 20
+
+
+def _new_photo_key() -> str:
+    # Direct uploads get a random key: the server never sees their bytes
+    return f"photos/{uuid.uuid4()}.jpg"
+
+
+def is_photo_key(value: str) -> bool:
+    return bool(PHOTO_KEY_RE.match(value))
 
 
-def upload_photos_and_presign(photo_sources: List[str]) -> List[str]:
+def issue_upload_urls(count: int) -> List[Dict[str, str]]:
     """
-    Accepts a list of photo sources (data URLs or http(s) URLs),
-    uploads them to MinIO, and returns presigned URLs.
+    Reserve ``count`` object keys and return presigned PUT URLs for them so
+    the kiosk can upload photo bytes straight to MinIO.
+    """
+    bucket = os.getenv("MINIO_BUCKET", "photobooth")
+    ensure_bucket(get_minio_client(), bucket)
+    keys = [_new_photo_key() for _ in range(count)]
+    return [{"key": key, "url": presign_put(bucket, key)} for key in keys]
+
+
+class _StoredIndex:
+    """Bounded LRU of object keys this process has already stored."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._keys: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+
+
+_stored = _StoredIndex(int(os.getenv("PHOTO_INDEX_MAX_ENTRIES", "10000")))
+
+
+def _content_key(digest: str) -> str:
+    return f"photos/{digest}.jpg"
+
+
+def _upload_one(client: Minio, bucket: str, source: str) -> str:
+    if source.startswith("data:"):
+        content = _decode_data_url(source)
+        content_type = source.split(";")[0].split("data:")[1] or "application/octet-stream"
+    else:
+        content = _fetch_binary(source)
+        content_type = "image/jpeg"
+
+    object_name = _content_key(hashlib.sha256(content).hexdigest())
+    if (bucket, object_name) in _stored:
+        return object_name
+
+    content_stream = io.BytesIO(content)
+    with timed("put_object"):
+        client.put_object(
+            bucket_name=bucket,
+            object_name=object_name,
+            data=content_stream,
+            length=len(content),
+            content_type=content_type,
+        )
+    _stored.add((bucket, object_name))
+    return object_name
+
+
+def _upload_stream_one(client: Minio, bucket: str, stream: BinaryIO, size: int, content_type: str) -> str:
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(block)
+    stream.seek(0)
+
+    object_name = _content_key(digest.hexdigest())
+    if (bucket, object_name) in _stored:
+        return object_name
+
+    with timed("put_object"):
+        client.put_object(
+            bucket_name=bucket,
+            object_name=object_name,
+            data=stream,
+            length=size,
+            content_type=content_type or "image/jpeg",
+        )
+    _stored.add((bucket, object_name))
+    return object_name
+
+
+def _ingest_parallel(
+    items: Sequence[T],
+    upload: Callable[[Minio, str, T], str],
+    max_workers: Optional[int] = None,
+) -> List[str]:
+    """
+    Upload ``items`` with up to ``max_workers`` threads (default
+    ``MINIO_UPLOAD_CONCURRENCY``) and return object keys in input order,
+    so a session costs roughly one round trip instead of one per photo.
+    Failures are collected per photo and raised together as ``PhotoUploadError``.
     """
     bucket = os.getenv("MINIO_BUCKET", "photobooth")
     client = get_minio_client()
-    ensure_bucket(client, bucket)
+    try:
+        ensure_bucket(client, bucket)
+    except STORAGE_ERRORS as exc:
+        raise PhotoUploadError({idx: str(exc) for idx in range(len(items))}) from exc
 
-    presigned_urls: List[str] = []
+    workers = min(max_workers or _upload_concurrency(), len(items)) or 1
+    object_names: List[Optional[str]] = [None] * len(items)
+    errors: Dict[int, str] = {}
 
-    for source in photo_sources:
+    def _run(idx: int, item: T) -> None:
         try:
-            if source.startswith("data:"):
-                content = _decode_data_url(source)
-                content_type = source.split(";")[0].split("data:")[1] or "application/octet-stream"
-            else:
-                content = _fetch_binary(source)
-                content_type = "image/jpeg"
-
-            object_name = f"photos/{uuid.uuid4()}.jpg"
-            content_stream = io.BytesIO(content)
-            client.put_object(
-                bucket_name=bucket,
-                object_name=object_name,
-                data=content_stream,
-                length=len(content),
-                content_type=content_type,
-            )
-
-            presigned = client.get_presigned_url(
-                "GET",
-                bucket_name=bucket,
-                object_name=object_name,
-                expires=timedelta(hours=24),  # 24 hours
-            )
-
-            # Replace internal Docker hostname with public endpoint
-            public_endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
-            internal_endpoint = os.getenv("MINIO_ENDPOINT", "minio:9000")
-            presigned = presigned.replace(f"http://{internal_endpoint}", f"http://{public_endpoint}")
-            presigned = presigned.replace(f"https://{internal_endpoint}", f"https://{public_endpoint}")
-
-            presigned_urls.append(presigned)
-        except (S3Error, requests.RequestException, ValueError) as exc:
-            raise RuntimeError(f"Failed to upload photo: {exc}") from exc
-
-    return presigned_urls
+            object_names[idx] = upload(client, bucket, item)
+        except STORAGE_ERRORS as exc:
+            errors[idx] = str(exc)
+
+    if workers == 1:
+        for idx, item in enumerate(items):
+            _run(idx, item)
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="minio-upload") as pool:
+            list(pool.map(_run, range(len(items)), items))
+
+    if errors:
+        raise PhotoUploadError(errors)
+
+    return [name for name in object_names if name is not None]
+
+
+def ingest_photos(photo_sources: List[str], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Accepts a list of photo sources (data URLs or http(s) URLs), uploads
+    them to MinIO and returns the object keys in input order.
+    """
+    return _ingest_parallel(photo_sources, _upload_one, max_workers=max_workers)
+
+
+def ingest_photo_files(photo_files: Sequence[Any], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Same as ``ingest_photos`` for uploaded file objects (anything with
+    ``size`` and ``content_type``); bytes are streamed to MinIO as-is.
+    """
+    return _ingest_parallel(
+        photo_files,
+        lambda client, bucket, f: _upload_stream_one(client, bucket, f, f.size, f.content_type),
+        max_workers=max_workers,
+    )
+
+
+def presign_photos(object_names: List[str]) -> List[str]:
+    """Presigned public GET URLs for already-stored photos (no network I/O)."""
+    bucket = os.getenv("MINIO_BUCKET", "photobooth")
+    with timed("presign"):
+        return [presign_get(bucket, name) for name in object_names]
+
+
+def upload_photos_and_presign(
+    photo_sources: List[str], max_workers: Optional[int] = None
+) -> List[str]:
+    """
+    Accepts a list of photo sources (data URLs or http(s) URLs),
+    uploads them to MinIO, and returns presigned URLs in input order.
+    """
+    return presign_photos(ingest_photos(photo_sources, max_workers=max_workers))
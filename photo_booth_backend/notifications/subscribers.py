@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import Subscriber
+
+# Bulk subscriber import: rows are parsed as they stream in and upserted on
+# email in batches of SUBSCRIBER_IMPORT_BATCH_SIZE, each batch its own
+# transaction, so an import never holds the whole file in memory.
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+}
+
+OPTIONAL_FIELDS = ("telegram_chat_id", "telegram_username")
+
+# Invalid rows echoed back in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def _batch_size() -> int:
+    return max(1, int(os.getenv("SUBSCRIBER_IMPORT_BATCH_SIZE", "1000")))
+
+
+def _field_limit(name: str) -> int:
+    return Subscriber._meta.get_field(name).max_length
+
+
+def _rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, raw row) pairs; CSV rows become dicts keyed by the header."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+
+def _clean(row: object) -> Tuple[Optional[Subscriber], Optional[str]]:
+    if not isinstance(row, dict):
+        return None, "row must be a JSON object"
+    email = row.get("email")
+    if not isinstance(email, str) or not email.strip():
+        return None, "email is required"
+    email = email.strip().lower()
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, "invalid email"
+
+    values: Dict[str, str] = {}
+    for name in OPTIONAL_FIELDS:
+        value = row.get(name)
+        if value is None or value == "":
+            continue
+        if isinstance(value, int) and name == "telegram_chat_id":
+            value = str(value)
+        if not isinstance(value, str):
+            return None, f"{name} must be a string"
+        value = value.strip()
+        if len(value) > _field_limit(name):
+            return None, f"{name} is too long"
+        if value:
+            values[name] = value
+    return Subscriber(email=email, **values), None
+
+
+def _upsert(batch: Dict[str, Subscriber]) -> Tuple[int, int, int]:
+    """
+    Insert or update one batch; returns (inserted, updated, unchanged).
+    Existing addresses in rows without Telegram columns have nothing to
+    write and count as unchanged.
+    """
+    existing = set(
+        Subscriber.objects.filter(email__in=list(batch)).values_list("email", flat=True)
+    )
+    # Only overwrite the columns a row actually carries, so importing a plain
+    # address list keeps the Telegram chats already linked to it
+    groups: Dict[Tuple[str, ...], List[Subscriber]] = {}
+    unchanged = 0
+    for subscriber in batch.values():
+        present = tuple(name for name in OPTIONAL_FIELDS if getattr(subscriber, name))
+        groups.setdefault(present, []).append(subscriber)
+        if not present and subscriber.email in existing:
+            unchanged += 1
+
+    with transaction.atomic():
+        for present, subscribers in groups.items():
+            if present:
+                Subscriber.objects.bulk_create(
+                    subscribers,
+                    update_conflicts=True,
+                    unique_fields=["email"],
+                    update_fields=list(present),
+                )
+            else:
+                Subscriber.objects.bulk_create(subscribers, ignore_conflicts=True)
+    return len(batch) - len(existing), len(existing) - unchanged, unchanged
+
+
+def import_subscribers(lines: Iterable[str], fmt: str) -> dict:
+    """
+    Upsert subscribers from CSV (header row with an ``email`` column) or
+    NDJSON lines. Returns inserted/updated/unchanged/invalid counts (plus
+    addresses repeated within a batch) and the import rate.
+    """
+    started = time.perf_counter()
+    batch_size = _batch_size()
+    report = {
+        "rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "invalid": 0, "errors": [],
+    }
+    # Keyed by email: a repeated address in one batch keeps its last row
+    batch: Dict[str, Subscriber] = {}
+
+    def write() -> None:
+        inserted, updated, unchanged = _upsert(batch)
+        report["inserted"] += inserted
+        report["updated"] += updated
+        report["unchanged"] += unchanged
+        batch.clear()
+
+    for line_number, row in _rows(lines, fmt):
+        report["rows"] += 1
+        subscriber, error = _clean(row)
+        if error:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "error": error})
+            continue
+        if subscriber.email in batch:
+            report["duplicates"] += 1
+        batch[subscriber.email] = subscriber
+        if len(batch) >= batch_size:
+            write()
+    if batch:
+        write()
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed) if elapsed else report["rows"]
+    return report
@@ -1,129 +1,441 @@
-from celery import shared_task
+import time
+import uuid
 
-from .services import DeliveryMethod, send_photos_with_fallback, send_status_sms
-from .storage import upload_photos_and_presign
+from celery import group, shared_task
+from celery.signals import worker_process_shutdown
+
+from .services import (
+    ChannelResult,
+    DeliveryMethod,
+    SendPayload,
+    delivery_deadline,
+    fallback_order,
+    send_plain_telegram_message,
+    send_status_sms,
+    send_via_channel,
+)
+from django.utils import timezone
+from .storage import ingest_photos, presign_photos
 from django.core.mail import EmailMessage
 from django.conf import settings
-from .models import Subscriber
+from .models import Subscriber, TelegramSession
+from .mail import chunked, send_mail_messages
+from .sessions import purge_expired_sessions, update_session_state
+from .breakers import get_breaker
+from .ratelimit import RateLimited
+from . import ledger, metrics
+from .metrics import observe
+from .broadcasts import (
+    finish_shard,
+    plan_shards,
+    record_shard_progress,
+    start_broadcast,
+    summarize_broadcast,
+)
+
+
+def _plain_email(subject: str, body: str, email: str) -> EmailMessage:
+    return EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+
 
+# Each delivery channel has its own queue so a slow provider only ties up
+# the workers sized for it.
+CHANNEL_QUEUES = {"email": "email", "sms": "sms", "telegram": "telegram"}
 
-@shared_task(name="notifications.tasks.send_photos_task")
+
+@worker_process_shutdown.connect
+def _flush_buffers(**kwargs) -> None:
+    # Do not lose the last few seconds of observations and ledger records
+    # when a child exits
+    metrics.flush()
+    ledger.flush()
+
+
+def _attempt_dict(attempt: ChannelResult) -> dict:
+    return {
+        "channel": attempt.channel,
+        "success": attempt.success,
+        "detail": attempt.detail,
+        "error": attempt.error,
+    }
+
+
+@shared_task(bind=True, name="notifications.tasks.send_photos_task")
 def send_photos_task(
+    self,
     recipient: str,
     photos: list[str],
     preferred_method: DeliveryMethod,
     notification_phone: str | None = None,
+    photo_keys: list[str] | None = None,
+) -> dict:
+    """
+    Entry point of the delivery pipeline: ingest -> per-channel delivery -> status SMS.
+
+    ``photo_keys`` are MinIO object keys ingested by the web process; raw
+    ``photos`` (data URLs or http links) are still accepted and uploaded here.
+    Delivery then continues on the preferred channel's queue.
+    """
+    started_at = time.time()
+    if photo_keys is None:
+        photo_keys = ingest_photos(photos)
+
+    channels = fallback_order(preferred_method)
+    ledger.record_queued(self.request.id, recipient, preferred_method, len(photo_keys), started_at)
+    deliver_photos_task.apply_async(
+        kwargs={
+            "recipient": recipient,
+            "photo_keys": photo_keys,
+            "preferred_method": preferred_method,
+            "channels": channels,
+            "attempts": [],
+            "notification_phone": notification_phone,
+            "root_task_id": self.request.id,
+            "started_at": started_at,
+        },
+        queue=CHANNEL_QUEUES[channels[0]],
+    )
+    return {"queued": True, "channel": channels[0], "photos": len(photo_keys)}
+
+
+def _skip_open_channels(
+    channels: list[DeliveryMethod], attempts: list[dict], root_task_id: str | None = None
+) -> list[DeliveryMethod]:
+    """Drop leading channels with an open breaker, recording them as skipped."""
+    while channels and get_breaker(channels[0]).is_open():
+        skipped = ChannelResult(
+            channel=channels[0],
+            success=False,
+            detail=f"Skipped {channels[0]}",
+            error="circuit open",
+            skipped=True,
+        )
+        attempts.append(_attempt_dict(skipped))
+        ledger.record_attempt(root_task_id, skipped.channel, False, skipped.error)
+        channels = channels[1:]
+    return channels
+
+
+@shared_task(name="notifications.tasks.deliver_photos_task")
+def deliver_photos_task(
+    recipient: str,
+    photo_keys: list[str],
+    preferred_method: DeliveryMethod,
+    channels: list[DeliveryMethod],
+    attempts: list[dict],
+    notification_phone: str | None = None,
+    root_task_id: str | None = None,
+    started_at: float | None = None,
+    throttled_since: float | None = None,
 ) -> dict:
-    presigned_photos = upload_photos_and_presign(photos)
+    """
+    Try ``channels[0]``; on failure hand the rest of the fallback order to
+    the next channel's queue, on success queue the status SMS.
 
-    result = send_photos_with_fallback(
-        recipient=recipient,
-        photos=presigned_photos,
-        preferred=preferred_method,
+    Channels whose circuit breaker is open are skipped here instead of being
+    queued. Each hop gets its own DELIVERY_DEADLINE_SECONDS budget from the
+    moment it starts, so time spent waiting in a queue never costs an attempt.
+    A rate-limited attempt is rescheduled on the same channel after its
+    ``retry_after``, for as long as the retries fit in one budget counted
+    from ``throttled_since``, the first throttled attempt.
+    """
+    channel = channels[0]
+    deadline = delivery_deadline()
+    payload = SendPayload(
+        recipient=recipient, photos=presign_photos(photo_keys), photo_keys=photo_keys
     )
+    attempt = send_via_channel(channel, payload, deadline)
+    attempts = attempts + [_attempt_dict(attempt)]
+    ledger.record_attempt(root_task_id, channel, attempt.success, attempt.error)
     status_notification = None
 
+    handoff = {
+        "recipient": recipient,
+        "photo_keys": photo_keys,
+        "preferred_method": preferred_method,
+        "attempts": attempts,
+        "notification_phone": notification_phone,
+        "root_task_id": root_task_id,
+        "started_at": started_at,
+    }
+
+    if attempt.retry_after is not None:
+        throttled_since = throttled_since or time.time()
+        if time.time() + attempt.retry_after < delivery_deadline(throttled_since):
+            # Throttled, not failed: retry the same channel once its bucket refills
+            deliver_photos_task.apply_async(
+                kwargs={**handoff, "channels": channels, "throttled_since": throttled_since},
+                queue=CHANNEL_QUEUES[channel],
+                countdown=attempt.retry_after,
+            )
+            return {"success": False, "attempts": attempts, "retry_in": attempt.retry_after}
+
+    if not attempt.success:
+        channels = channels[:1] + _skip_open_channels(channels[1:], attempts, root_task_id)
+
+    if not attempt.success and len(channels) > 1:
+        deliver_photos_task.apply_async(
+            kwargs={**handoff, "channels": channels[1:]},
+            queue=CHANNEL_QUEUES[channels[1]],
+        )
+        return {"success": False, "attempts": attempts, "next_channel": channels[1]}
+
+    ledger.record_outcome(
+        root_task_id, recipient, preferred_method, len(photo_keys), attempt.success, channel, started_at
+    )
+    if started_at is not None:
+        observe(
+            "photo_booth_delivery_seconds",
+            time.time() - started_at,
+            channel=channel,
+            outcome="success" if attempt.success else "failure",
+        )
+
     if (
         notification_phone
-        and result.success
+        and attempt.success
         and preferred_method in {"email", "telegram"}
     ):
-        try:
-            last_channel = result.attempts[-1].channel if result.attempts else preferred_method
-            message = f"Your AI Photo Booth photos were delivered via {last_channel.upper()}."
-            send_status_sms(notification_phone, message)
-            status_notification = {"sent": True, "channel": "sms", "message": message}
-        except Exception as exc:
-            status_notification = {"sent": False, "channel": "sms", "error": str(exc)}
+        message = f"Your AI Photo Booth photos were delivered via {channel.upper()}."
+        send_status_notification_task.apply_async(
+            args=(notification_phone, message), queue=CHANNEL_QUEUES["sms"]
+        )
+        status_notification = {"queued": True, "channel": "sms", "message": message}
 
     return {
-        "success": result.success,
-        "attempts": [
-            {
-                "channel": attempt.channel,
-                "success": attempt.success,
-                "detail": attempt.detail,
-                "error": attempt.error,
-            }
-            for attempt in result.attempts
-        ],
+        "success": attempt.success,
+        "attempts": attempts,
         "status_notification": status_notification,
+        "root_task_id": root_task_id,
     }
 
 
+@shared_task(name="notifications.tasks.send_status_notification_task")
+def send_status_notification_task(phone: str, message: str) -> dict:
+    try:
+        send_status_sms(phone, message)
+        return {"sent": True, "channel": "sms", "message": message}
+    except Exception as exc:
+        return {"sent": False, "channel": "sms", "error": str(exc)}
+
+
 @shared_task(name="notifications.tasks.send_broadcast_email_task")
 def send_broadcast_email_task(subject: str, body: str) -> dict:
     recipients = list(Subscriber.objects.values_list("email", flat=True))
     sent = 0
     failed = []
 
-    for email in recipients:
-        try:
-            msg = EmailMessage(
-                subject=subject,
-                body=body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[email],
-            )
-            msg.send(fail_silently=False)
-            sent += 1
-        except Exception as exc:
-            failed.append({"email": email, "error": str(exc)})
+    # One pooled SMTP session for the whole broadcast, in EMAIL_BATCH_SIZE chunks
+    for chunk in chunked(recipients):
+        messages = [_plain_email(subject, body, email) for email in chunk]
+        for email, error in zip(chunk, send_mail_messages(messages)):
+            if error:
+                failed.append({"email": email, "error": error})
+            else:
+                sent += 1
 
     return {"total": len(recipients), "sent": sent, "failed": failed}
 
 
-@shared_task(name="notifications.tasks.send_general_notification_task")
+@shared_task(bind=True, name="notifications.tasks.send_general_notification_task")
 def send_general_notification_task(
+    self,
     subject: str,
     body: str,
     include_sms: bool = False,
     include_telegram: bool = False,
 ) -> dict:
     """
-    Send a plain notification email to all subscribers.
-    Telegram notifications are real if chat data exists.
-    SMS is simulated until numbers are collected.
+    Fan a notification out to all subscribers as id-range shards.
+    Email is sent to everyone, Telegram is real if chat data exists,
+    SMS is simulated until numbers are collected. Progress and the merged
+    summary are available by this task's id (see get_broadcast_status).
     """
-    subscribers = Subscriber.objects.all()
-    sent_email = 0
-    failed_email = []
-    sent_telegram = 0
-    failed_telegram = []
-
-    for subscriber in subscribers:
-        if subscriber.email:
-            try:
-                msg = EmailMessage(
-                    subject=subject,
-                    body=body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[subscriber.email],
-                )
-                msg.send(fail_silently=False)
-                sent_email += 1
-            except Exception as exc:
-                failed_email.append({"email": subscriber.email, "error": str(exc)})
+    broadcast_id = self.request.id or str(uuid.uuid4())
+    shards = plan_shards()
+    start_broadcast(
+        broadcast_id,
+        shards,
+        {"include_sms": include_sms, "include_telegram": include_telegram},
+    )
 
-        if include_telegram:
-            chat_id = subscriber.telegram_chat_id or subscriber.telegram_username
-            if chat_id:
-                try:
-                    send_plain_telegram_message(chat_id, body)
-                    sent_telegram += 1
-                except Exception as exc:
-                    failed_telegram.append({"chat": chat_id, "error": str(exc)})
+    group(
+        send_notification_shard_task.s(
+            broadcast_id, idx, id_from, id_to, subject, body, include_telegram
+        )
+        for idx, (id_from, id_to) in enumerate(shards)
+    ).apply_async()
 
-    simulated_sms = subscribers.count() if include_sms else 0
+    if not shards:
+        return summarize_broadcast(broadcast_id)
+    return {"broadcast_id": broadcast_id, "shards": len(shards)}
 
-    return {
-        "recipients": subscribers.count(),
-        "email": {"sent": sent_email, "failed": failed_email},
-        "telegram": {
-            "sent": sent_telegram,
-            "failed": failed_telegram,
-        }
-        if include_telegram
-        else None,
-        "sms_simulated": simulated_sms,
+
+def _send_broadcast_telegram(chat_id: str, body: str) -> None:
+    # Broadcasts have no deadline: wait out a long Telegram penalty once
+    # rather than dropping the subscriber.
+    try:
+        send_plain_telegram_message(chat_id, body)
+    except RateLimited as exc:
+        time.sleep(exc.retry_after)
+        send_plain_telegram_message(chat_id, body)
+
+
+@shared_task(name="notifications.tasks.send_notification_shard_task")
+def send_notification_shard_task(
+    broadcast_id: str,
+    shard_index: int,
+    id_from: int,
+    id_to: int,
+    subject: str,
+    body: str,
+    include_telegram: bool = False,
+) -> dict:
+    """Deliver one broadcast shard (subscribers with id_from <= id < id_to)."""
+    subscribers = (
+        Subscriber.objects.filter(id__gte=id_from, id__lt=id_to)
+        .order_by("id")
+        .only("email", "telegram_chat_id", "telegram_username")
+        .iterator(chunk_size=2000)
+    )
+    progress = {
+        "status": "running",
+        "processed": 0,
+        "email": {"sent": 0, "failed": []},
+        "telegram": {"sent": 0, "failed": []},
     }
+
+    for chunk in chunked(subscribers):
+        with_email = [subscriber for subscriber in chunk if subscriber.email]
+        messages = [_plain_email(subject, body, subscriber.email) for subscriber in with_email]
+        for subscriber, error in zip(with_email, send_mail_messages(messages)):
+            if error:
+                progress["email"]["failed"].append({"email": subscriber.email, "error": error})
+            else:
+                progress["email"]["sent"] += 1
+
+        if include_telegram:
+            for subscriber in chunk:
+                chat_id = subscriber.telegram_chat_id or subscriber.telegram_username
+                if chat_id:
+                    try:
+                        _send_broadcast_telegram(chat_id, body)
+                        progress["telegram"]["sent"] += 1
+                    except Exception as exc:
+                        progress["telegram"]["failed"].append({"chat": chat_id, "error": str(exc)})
+
+        progress["processed"] += len(chunk)
+        record_shard_progress(broadcast_id, shard_index, progress)
+
+    progress["status"] = "done"
+    record_shard_progress(broadcast_id, shard_index, progress)
+    if finish_shard(broadcast_id):
+        summarize_broadcast_task.delay(broadcast_id)
+    return progress
+
+
+@shared_task(name="notifications.tasks.summarize_broadcast_task")
+def summarize_broadcast_task(broadcast_id: str) -> dict:
+    return summarize_broadcast(broadcast_id)
+
+
+@shared_task(name="notifications.tasks.purge_expired_sessions_task")
+def purge_expired_sessions_task() -> dict:
+    """
+    Beat job: drop expired Telegram sessions in bounded batches. A run that
+    hits its batch limit queues a follow-up instead of running on.
+    """
+    deleted, more = purge_expired_sessions()
+    if more:
+        purge_expired_sessions_task.apply_async(countdown=1)
+    return {"deleted": deleted, "more": more}
+
+
+def _remember_telegram_chat(username: str, chat_id: str) -> None:
+    # Store in subscriber database for future lookups: one UPDATE for known
+    # usernames, otherwise one upsert of the placeholder subscriber
+    if username:
+        updated = Subscriber.objects.filter(telegram_username=f"@{username}").update(
+            telegram_chat_id=chat_id
+        )
+        if not updated:
+            Subscriber.objects.bulk_create(
+                [
+                    Subscriber(
+                        email=f"{username}@telegram.temp",
+                        telegram_username=f"@{username}",
+                        telegram_chat_id=chat_id,
+                    )
+                ],
+                update_conflicts=True,
+                unique_fields=["email"],
+                update_fields=["telegram_username", "telegram_chat_id"],
+            )
+
+
+@shared_task(name="notifications.tasks.process_telegram_start_task")
+def process_telegram_start_task(chat_id: str, text: str, username: str = "", first_name: str = "User") -> dict:
+    """
+    Handle a /start update queued by the webhook: claim the deep-link
+    session, greet the user and queue photo delivery.
+    """
+    parts = text.split(" ", 1)
+    session_id = parts[1].strip() if len(parts) > 1 else None
+
+    if not session_id:
+        # Normal /start without session - just welcome
+        welcome_msg = (
+            f"Welcome {first_name}!\n\n"
+            "I'm the AI Photo Booth bot.\n"
+            "Use the photo booth website to take photos, "
+            "then enter your @username to receive them here!"
+        )
+        send_plain_telegram_message(chat_id, welcome_msg)
+        _remember_telegram_chat(username, chat_id)
+        return {"session_id": None, "linked": False}
+
+    # Claim the session with one conditional UPDATE; concurrent or redelivered
+    # updates for the same session match zero rows.
+    claimed = TelegramSession.objects.filter(
+        session_id=session_id,
+        is_linked=False,
+        expires_at__gt=timezone.now(),
+    ).update(telegram_chat_id=chat_id, is_linked=True)
+
+    if not claimed:
+        # Session expired, invalid or already linked
+        send_plain_telegram_message(
+            chat_id,
+            "Sorry, this link has expired. Please try again from the photo booth website.",
+        )
+        return {"session_id": session_id, "linked": False}
+
+    update_session_state(session_id, is_linked=True)
+    session = TelegramSession.objects.only(
+        "photos", "preferred_method", "notification_phone"
+    ).get(session_id=session_id)
+
+    _remember_telegram_chat(username, chat_id)
+
+    try:
+        send_plain_telegram_message(chat_id, f"Hi {first_name}! Your photos are being sent now...")
+    except Exception as exc:  # noqa: BLE001 - greeting is best effort, delivery still goes ahead
+        print(f"Telegram greeting failed for {chat_id}: {exc}")
+
+    async_result = send_photos_task.delay(
+        recipient=chat_id,
+        photos=[],
+        preferred_method=session.preferred_method,
+        notification_phone=session.notification_phone,
+        photo_keys=session.photos,
+    )
+    TelegramSession.objects.filter(session_id=session_id).update(
+        is_sent=True, task_id=async_result.id
+    )
+    update_session_state(session_id, is_sent=True, task_id=async_result.id)
+    return {"session_id": session_id, "linked": True, "task_id": async_result.id}
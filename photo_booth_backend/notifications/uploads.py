@@ -0,0 +1,51 @@
+import os
+from tempfile import SpooledTemporaryFile
+from typing import List
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+class SpooledPhotoUploadHandler(FileUploadHandler):
+    """
+    Streams each multipart photo into a SpooledTemporaryFile.
+
+    Parts stay in memory up to ``PHOTO_UPLOAD_SPOOL_BYTES`` and roll over to
+    disk beyond that, so peak memory per request is bounded regardless of the
+    payload. A part larger than ``PHOTO_UPLOAD_MAX_BYTES`` stops the upload and
+    is recorded in ``oversized`` for the view to report.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_part_bytes = int(os.getenv("PHOTO_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.spool_bytes = int(os.getenv("PHOTO_UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+        self.oversized: List[str] = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = SpooledTemporaryFile(max_size=self.spool_bytes, mode="w+b")
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_part_bytes:
+            self.oversized.append(self.file_name)
+            self.file.close()
+            raise StopUpload(connection_reset=False)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return UploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, "file"):
+            self.file.close()
@@ -2,18 +2,30 @@ from django.urls import path
 
 from .views import (
     send_photos,
+    create_upload_urls,
     subscribe_email,
+    import_subscribers,
     broadcast_email,
     send_general_notification,
+    broadcast_status,
+    channel_status,
+    delivery_status,
+    metrics_view,
     telegram_webhook,
     check_session_status,
 )
 
 urlpatterns = [
     path("send/", send_photos, name="send_photos"),
+    path("uploads/", create_upload_urls, name="create_upload_urls"),
     path("subscribe/", subscribe_email, name="subscribe_email"),
+    path("subscribers/import/", import_subscribers, name="import_subscribers"),
     path("broadcast/", broadcast_email, name="broadcast_email"),
     path("notify/", send_general_notification, name="send_general_notification"),
+    path("notify/status/", broadcast_status, name="broadcast_status"),
+    path("channels/", channel_status, name="channel_status"),
+    path("deliveries/", delivery_status, name="delivery_status"),
+    path("metrics/", metrics_view, name="metrics"),
     path("telegram/webhook/", telegram_webhook, name="telegram_webhook"),
     path("telegram/session/", check_session_status, name="check_session_status"),
 ]
@@ -1,10 +1,16 @@
+import codecs
+import hmac
 import json
+import logging
+import os
+import threading
+import time
 from typing import Any, Dict
 from datetime import timedelta
 from django.utils import timezone
 import uuid
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
@@ -12,8 +18,43 @@ from .tasks import (
     send_photos_task,
     send_broadcast_email_task,
     send_general_notification_task,
+    process_telegram_start_task,
 )
 from .models import Subscriber, TelegramSession
+from .storage import (
+    MAX_UPLOAD_URLS,
+    ingest_photo_files,
+    ingest_photos,
+    is_photo_key,
+    issue_upload_urls,
+)
+from . import idempotency, ledger, metrics
+from .uploads import SpooledPhotoUploadHandler
+from .breakers import breaker_states
+from .services import CHANNEL_PRIORITY
+from .broadcasts import get_broadcast_status
+from .sessions import cache_session_state, get_session_state, is_expired
+from .process_local import ProcessLocal
+from .subscribers import IMPORT_FORMATS, import_subscribers as run_subscriber_import
+
+logger = logging.getLogger(__name__)
+
+
+def _ingest_photos_or_error(
+    photos: list[str],
+    photo_keys: list[str] | None = None,
+    photo_files: list | None = None,
+) -> tuple[list[str] | None, JsonResponse | None]:
+    """Store photo bytes in MinIO once so Celery messages only carry object keys."""
+    if photo_keys is not None:
+        # Already uploaded by the kiosk through /uploads/ presigned URLs
+        return photo_keys, None
+    try:
+        if photo_files:
+            return ingest_photo_files(photo_files), None
+        return ingest_photos(photos), None
+    except RuntimeError as exc:
+        return None, JsonResponse({"error": f"Failed to store photos: {exc}"}, status=502)
 
 
 @csrf_exempt
@@ -25,10 +66,31 @@ def send_photos(request):
     if request.method != "POST":
         return JsonResponse({"error": "Method not allowed"}, status=405)
 
-    try:
-        payload: Dict[str, Any] = json.loads(request.body.decode("utf-8"))
-    except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON payload"}, status=400)
+    photo_files: list = []
+    if request.content_type == "multipart/form-data":
+        # Raw JPEG parts are spooled to temp files instead of base64 in JSON
+        handler = SpooledPhotoUploadHandler(request)
+        request.upload_handlers = [handler]
+        try:
+            payload: Dict[str, Any] = request.POST.dict()
+            photo_files = request.FILES.getlist("photos")
+        except Exception:
+            return JsonResponse({"error": "Invalid multipart payload"}, status=400)
+        if handler.oversized:
+            return JsonResponse(
+                {"error": f"Photo exceeds {handler.max_part_bytes} bytes: {handler.oversized[0]}"},
+                status=413,
+            )
+        if not photo_files:
+            return JsonResponse({"error": "photos file parts are required"}, status=400)
+        if not all((item.content_type or "").startswith("image/") for item in photo_files):
+            return JsonResponse({"error": "photos must be image files"}, status=400)
+        payload.pop("photos", None)
+    else:
+        try:
+            payload = json.loads(request.body.decode("utf-8"))
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON payload"}, status=400)
 
     recipient = payload.get("recipient")
     photos = payload.get("photos", [])
@@ -40,6 +102,13 @@ def send_photos(request):
     if not isinstance(photos, list) or not all(isinstance(item, str) for item in photos):
         return JsonResponse({"error": "photos must be a list of strings"}, status=400)
 
+    photo_keys = payload.get("photo_keys")
+    if photo_keys is not None and (
+        not isinstance(photo_keys, list)
+        or not all(isinstance(item, str) and is_photo_key(item) for item in photo_keys)
+    ):
+        return JsonResponse({"error": "photo_keys must be a list of keys issued by /uploads/"}, status=400)
+
     if preferred not in {"email", "sms", "telegram"}:
         return JsonResponse({"error": "preferred_method must be email, sms, or telegram"}, status=400)
 
@@ -47,6 +116,40 @@ def send_photos(request):
         if "@" not in recipient or recipient.startswith("@"):
             return JsonResponse({"error": "Invalid email address"}, status=400)
 
+    # Double taps and client retries replay the first response instead of
+    # uploading the photos and queueing delivery again
+    key, ttl = idempotency.request_key(
+        request.headers.get("Idempotency-Key"),
+        {
+            "recipient": recipient,
+            "preferred_method": preferred,
+            "notification_phone": payload.get("notification_phone"),
+            "photos": photos,
+            "photo_keys": photo_keys,
+        },
+        photo_files,
+    )
+    replay = idempotency.begin(key, ttl)
+    if replay is not None:
+        return replay
+    try:
+        response = _accept_send(payload, recipient, photos, photo_keys, preferred, photo_files)
+    except Exception:
+        idempotency.release(key)
+        raise
+    idempotency.finish(key, ttl, response)
+    return response
+
+
+def _accept_send(
+    payload: Dict[str, Any],
+    recipient: str,
+    photos: list[str],
+    photo_keys: list[str] | None,
+    preferred: str,
+    photo_files: list,
+) -> JsonResponse:
+    """Store the photos and open a Telegram session or queue delivery."""
     notification_phone = payload.get("notification_phone")
     notification_phone_normalized = None
 
@@ -56,14 +159,18 @@ def send_photos(request):
 
         # If username provided, create a session for deep linking
         if recipient.startswith("@"):
+            photo_keys, error = _ingest_photos_or_error(photos, photo_keys, photo_files)
+            if error:
+                return error
             session = TelegramSession.objects.create(
                 session_id=str(uuid.uuid4())[:8],
                 telegram_username=recipient,
-                photos=photos,
+                photos=photo_keys,
                 preferred_method=preferred,
                 notification_phone=payload.get("notification_phone"),
                 expires_at=timezone.now() + timedelta(minutes=15),
             )
+            cache_session_state(session.session_id, session.expires_at)
             return JsonResponse(
                 {
                     "requires_telegram_start": True,
@@ -84,11 +191,16 @@ def send_photos(request):
             return JsonResponse({"error": "notification_phone must be in international format, e.g. +1234567890"}, status=400)
         notification_phone_normalized = normalized_phone
 
+    photo_keys, error = _ingest_photos_or_error(photos, photo_keys, photo_files)
+    if error:
+        return error
+
     async_result = send_photos_task.delay(
         recipient=recipient.strip(),
-        photos=photos,
+        photos=[],
         preferred_method=preferred,  # type: ignore[arg-type]
         notification_phone=notification_phone_normalized,
+        photo_keys=photo_keys,
     )
     return JsonResponse(
         {
@@ -99,6 +211,32 @@ def send_photos(request):
     )
 
 
+@csrf_exempt
+def create_upload_urls(request):
+    """Issue presigned PUT URLs so the kiosk uploads photo bytes straight to MinIO"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        payload: Dict[str, Any] = json.loads(request.body.decode("utf-8") or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON payload"}, status=400)
+
+    count = payload.get("count")
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_UPLOAD_URLS:
+        return JsonResponse({"error": f"count must be an integer between 1 and {MAX_UPLOAD_URLS}"}, status=400)
+
+    try:
+        uploads = issue_upload_urls(count)
+    except Exception as exc:
+        return JsonResponse({"error": f"Failed to prepare uploads: {exc}"}, status=502)
+
+    return JsonResponse({"uploads": uploads, "method": "PUT", "content_type": "image/jpeg"}, status=200)
+
+
 @csrf_exempt
 @require_POST
 def subscribe_email(request):
@@ -144,6 +282,37 @@ def subscribe_email(request):
     )
 
 
+@csrf_exempt
+@require_POST
+def import_subscribers(request):
+    """
+    Bulk upsert of subscribers from a CSV (``text/csv``, header row with
+    ``email`` and optional ``telegram_chat_id``/``telegram_username``) or
+    NDJSON (``application/x-ndjson``) body. The body is read as a stream and
+    written in batches; the response counts inserted, updated, unchanged and
+    invalid rows.
+
+    The import can overwrite the Telegram chat any address is delivered to,
+    so it is disabled (503) until ``SUBSCRIBER_IMPORT_TOKEN`` is set and then
+    needs ``Authorization: Bearer <token>``.
+    """
+    token = os.getenv("SUBSCRIBER_IMPORT_TOKEN")
+    if not token:
+        return JsonResponse({"error": "Subscriber import is not configured"}, status=503)
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+
+    fmt = IMPORT_FORMATS.get(request.content_type)
+    if fmt is None:
+        return JsonResponse(
+            {"error": f"Content-Type must be one of {', '.join(IMPORT_FORMATS)}"}, status=415
+        )
+
+    # Iterating the request reads it line by line without buffering the body
+    lines = codecs.iterdecode(request, "utf-8-sig", errors="replace")
+    return JsonResponse(run_subscriber_import(lines, fmt), status=200)
+
+
 @csrf_exempt
 @require_POST
 def broadcast_email(request):
@@ -187,6 +356,82 @@ def send_general_notification(request):
     return JsonResponse({"accepted": True, "task_id": async_result.id}, status=202)
 
 
+@csrf_exempt
+def broadcast_status(request):
+    """Per-shard progress and merged summary of a /notify/ broadcast"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    broadcast_id = request.GET.get("broadcast_id") or request.GET.get("task_id")
+    if not broadcast_id:
+        return JsonResponse({"error": "broadcast_id required"}, status=400)
+
+    status = get_broadcast_status(broadcast_id)
+    if status is None:
+        return JsonResponse({"error": "Broadcast not found"}, status=404)
+    return JsonResponse(status, status=200)
+
+
+@csrf_exempt
+def channel_status(request):
+    """Circuit breaker state of every delivery channel"""
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    return JsonResponse(
+        {"channels": breaker_states(CHANNEL_PRIORITY)}, status=200
+    )
+
+
+@csrf_exempt
+def delivery_status(request):
+    """
+    Photo delivery status from the ledger: one delivery by ``task_id`` (the
+    id returned by /send/ or a Telegram session), or the latest ``limit``
+    deliveries to ``recipient``.
+    """
+    if request.method == "OPTIONS":
+        return JsonResponse({}, status=200)
+
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    task_id = request.GET.get("task_id")
+    if task_id:
+        delivery = ledger.get_delivery(task_id)
+        if delivery is None:
+            return JsonResponse({"error": "Delivery not found"}, status=404)
+        return JsonResponse(delivery, status=200)
+
+    recipient = (request.GET.get("recipient") or "").strip()
+    if not recipient:
+        return JsonResponse({"error": "task_id or recipient required"}, status=400)
+    try:
+        limit = int(request.GET.get("limit", 20))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= ledger.RECIPIENT_LOOKUP_LIMIT:
+        return JsonResponse(
+            {"error": f"limit must be an integer between 1 and {ledger.RECIPIENT_LOOKUP_LIMIT}"}, status=400
+        )
+    return JsonResponse(
+        {"recipient": recipient, "deliveries": ledger.deliveries_for(recipient, limit)}, status=200
+    )
+
+
+def metrics_view(request):
+    """Pipeline latency histograms and counters in Prometheus text format"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @csrf_exempt
 def telegram_webhook(request):
     """Handle incoming Telegram bot updates (when user clicks /start)"""
@@ -196,104 +441,65 @@ def telegram_webhook(request):
     if request.method != "POST":
         return JsonResponse({"error": "Method not allowed"}, status=405)
 
+    secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+    if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+        return JsonResponse({"error": "Forbidden"}, status=403)
+
     try:
         update = json.loads(request.body.decode("utf-8"))
         message = update.get("message", {})
 
         # Extract user info
         chat_id = str(message.get("chat", {}).get("id", ""))
+        text = message.get("text", "")
         username = message.get("from", {}).get("username", "")
         first_name = message.get("from", {}).get("first_name", "User")
-        text = message.get("text", "")
+    except Exception:
+        # A malformed update will not get better on redelivery: acknowledge it
+        logger.exception("Telegram webhook: unreadable update")
+        return JsonResponse({"ok": True}, status=200)
 
-        if not chat_id:
-            return JsonResponse({"ok": True}, status=200)
-
-        # Handle /start command with deep link parameter
-        if text.startswith("/start"):
-            parts = text.split(" ", 1)
-            session_id = parts[1] if len(parts) > 1 else None
-
-            # If session_id provided, link it and send photos
-            if session_id:
-                try:
-                    session = TelegramSession.objects.get(
-                        session_id=session_id,
-                        is_linked=False,
-                        expires_at__gt=timezone.now(),
-                    )
-
-                    # Link chat_id to session
-                    session.telegram_chat_id = chat_id
-                    session.is_linked = True
-                    session.save()
-
-                    # Store in subscriber database for future use
-                    if username:
-                        subscriber, _ = Subscriber.objects.get_or_create(
-                            telegram_username=f"@{username}",
-                            defaults={"email": f"{username}@telegram.temp"},
-                        )
-                        subscriber.telegram_chat_id = chat_id
-                        subscriber.save()
-
-                    # Send photos immediately
-                    from .services import _send_telegram_message
-                    _send_telegram_message(
-                        chat_id,
-                        f"Hi {first_name}! Your photos are being sent now...",
-                    )
-
-                    # Queue photo delivery task
-                    async_result = send_photos_task.delay(
-                        recipient=chat_id,
-                        photos=session.photos,
-                        preferred_method=session.preferred_method,
-                        notification_phone=session.notification_phone,
-                    )
-
-                    session.is_sent = True
-                    session.task_id = async_result.id
-                    session.save()
-
-                except TelegramSession.DoesNotExist:
-                    # Session expired or invalid
-                    from .services import _send_telegram_message
-                    _send_telegram_message(
-                        chat_id,
-                        "Sorry, this link has expired. Please try again from the photo booth website.",
-                    )
-
-            else:
-                # Normal /start without session - just welcome
-                from .services import _send_telegram_message
-                welcome_msg = (
-                    f"Welcome {first_name}!\n\n"
-                    "I'm the AI Photo Booth bot.\n"
-                    "Use the photo booth website to take photos, "
-                    "then enter your @username to receive them here!"
-                )
-                _send_telegram_message(chat_id, welcome_msg)
-
-                # Save user for future lookups
-                if username:
-                    subscriber, _ = Subscriber.objects.get_or_create(
-                        telegram_username=f"@{username}",
-                        defaults={"email": f"{username}@telegram.temp"},
-                    )
-                    subscriber.telegram_chat_id = chat_id
-                    subscriber.save()
+    # Only /start needs work; everything else is acknowledged as-is
+    if chat_id and text.startswith("/start"):
+        # Ack immediately; linking, replies and delivery run on the worker
+        try:
+            process_telegram_start_task.delay(
+                chat_id=chat_id, text=text, username=username, first_name=first_name
+            )
+        except Exception:
+            # Not queued (broker down): a 5xx makes Telegram redeliver the
+            # update, and the conditional claim makes a redelivery safe
+            logger.exception("Telegram webhook: could not queue /start for chat %s", chat_id)
+            return JsonResponse({"ok": False, "error": "Try again later"}, status=503)
 
-        return JsonResponse({"ok": True}, status=200)
+    return JsonResponse({"ok": True}, status=200)
+
+
+SESSION_MAX_WAIT_SECONDS = 25
+SESSION_POLL_INTERVAL_SECONDS = 0.5
+# Told to kiosks that arrive while every long-poll slot is taken
+SESSION_BUSY_RETRY_SECONDS = 2
+
+_session_waiters: ProcessLocal[threading.BoundedSemaphore] = ProcessLocal(threading.BoundedSemaphore)
 
-    except Exception as e:
-        print(f"Telegram webhook error: {e}")
-        return JsonResponse({"ok": True}, status=200)  # Always return 200 to Telegram
+
+def _session_waiter_slots() -> threading.BoundedSemaphore:
+    # Each waiting kiosk holds a server thread; the cap keeps threads free
+    # for /send/ and the webhook (the call that ends the waits)
+    return _session_waiters.get(max(1, int(os.getenv("SESSION_MAX_WAITERS", "4"))))
 
 
 @csrf_exempt
 def check_session_status(request):
-    """Check if Telegram session is linked (user clicked Start)"""
+    """
+    Check if Telegram session is linked (user clicked Start).
+
+    With ``wait=<seconds>`` (up to 25) this long-polls: the response is held
+    until photos are sent, the session expires or the wait runs out. State is
+    read from the cache, so waiting kiosks cost next to no database queries.
+    Past ``SESSION_MAX_WAITERS`` waiting requests per process the current
+    state is returned at once with ``retry_after``.
+    """
     if request.method == "OPTIONS":
         return JsonResponse({}, status=200)
 
@@ -305,29 +511,50 @@ def check_session_status(request):
         return JsonResponse({"error": "session_id required"}, status=400)
 
     try:
-        session = TelegramSession.objects.get(session_id=session_id)
+        wait = min(float(request.GET.get("wait", 0)), SESSION_MAX_WAIT_SECONDS)
+    except ValueError:
+        return JsonResponse({"error": "wait must be a number of seconds"}, status=400)
 
-        if session.expires_at < timezone.now():
-            return JsonResponse(
-                {
-                    "session_id": session_id,
-                    "is_linked": False,
-                    "is_sent": False,
-                    "expired": True,
-                },
-                status=200,
-            )
+    state = get_session_state(session_id)
+    if state is None:
+        return JsonResponse({"error": "Session not found"}, status=404)
 
+    retry_after = None
+    if wait > 0 and not state["is_sent"] and not is_expired(state):
+        slots = _session_waiter_slots()
+        if slots.acquire(blocking=False):
+            try:
+                deadline = time.monotonic() + wait
+                while not state["is_sent"] and not is_expired(state) and time.monotonic() < deadline:
+                    time.sleep(SESSION_POLL_INTERVAL_SECONDS)
+                    state = get_session_state(session_id) or state
+            finally:
+                slots.release()
+        else:
+            retry_after = SESSION_BUSY_RETRY_SECONDS
+
+    if is_expired(state):
         return JsonResponse(
             {
                 "session_id": session_id,
-                "is_linked": session.is_linked,
-                "is_sent": session.is_sent,
-                "task_id": session.task_id,
-                "expired": False,
+                "is_linked": False,
+                "is_sent": False,
+                "expired": True,
             },
             status=200,
         )
 
-    except TelegramSession.DoesNotExist:
-        return JsonResponse({"error": "Session not found"}, status=404)
+    response = JsonResponse(
+        {
+            "session_id": session_id,
+            "is_linked": state["is_linked"],
+            "is_sent": state["is_sent"],
+            "task_id": state["task_id"],
+            "expired": False,
+            "retry_after": retry_after,
+        },
+        status=200,
+    )
+    if retry_after is not None:
+        response["Retry-After"] = str(retry_after)
+    return response
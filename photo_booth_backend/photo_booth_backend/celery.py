@@ -12,9 +12,26 @@ celery_app.conf.broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6
 celery_app.conf.result_backend = os.getenv("CELERY_RESULT_BACKEND", "")
 celery_app.conf.task_default_queue = "default"
 celery_app.conf.task_routes = {
+    # Webhook updates get their own queue so deliveries never delay them
+    "notifications.tasks.process_telegram_start_task": {"queue": "telegram_updates"},
     "notifications.tasks.send_photos_task": {"queue": "notifications"},
+    # deliver_photos_task is sent to the email/telegram/sms queue of its channel
+    "notifications.tasks.send_status_notification_task": {"queue": "sms"},
     "notifications.tasks.send_broadcast_email_task": {"queue": "notifications"},
     "notifications.tasks.send_general_notification_task": {"queue": "notifications"},
+    "notifications.tasks.send_notification_shard_task": {"queue": "notifications"},
+    "notifications.tasks.summarize_broadcast_task": {"queue": "notifications"},
+    "notifications.tasks.purge_expired_sessions_task": {"queue": "notifications"},
+}
+
+celery_app.conf.beat_schedule = {
+    "purge-expired-telegram-sessions": {
+        "task": "notifications.tasks.purge_expired_sessions_task",
+        "schedule": crontab(
+            minute=f"*/{int(os.getenv('TELEGRAM_SESSION_PURGE_EVERY_MINUTES', '10'))}"
+        ),
+        "options": {"queue": "notifications"},
+    }
 }
 
 if os.getenv("ENABLE_DAILY_NOTIFICATION", "false").lower() == "true":
@@ -26,14 +43,12 @@ if os.getenv("ENABLE_DAILY_NOTIFICATION", "false").lower() == "true":
         "Зайдите и сделайте сегодня шикарное фото!",
     )
 
-    celery_app.conf.beat_schedule = {
-        "daily-engagement-notification": {
-            "task": "notifications.tasks.send_general_notification_task",
-            "schedule": crontab(hour=hour, minute=minute),
-            "args": (subject, body),
-            "kwargs": {"include_sms": False, "include_telegram": False},
-            "options": {"queue": "notifications"},
-        }
+    celery_app.conf.beat_schedule["daily-engagement-notification"] = {
+        "task": "notifications.tasks.send_general_notification_task",
+        "schedule": crontab(hour=hour, minute=minute),
+        "args": (subject, body),
+        "kwargs": {"include_sms": False, "include_telegram": False},
+        "options": {"queue": "notifications"},
     }
 
 celery_app.autodiscover_tasks()